@@ -0,0 +1,178 @@
+"""
+Acquisition throughput benchmark for Task2.
+
+Measures how many samples per second each stage of the acquisition path handles, for every
+combination of number of analog channels and block size (``nSamples``):
+
+* ``crc``     - :func:`bitalino.crc4` on blocks of frames already in memory
+* ``decode``  - :func:`bitalino.decodeFrames` on blocks of frames already in memory
+* ``receive`` - ``BITalino.receive`` of a whole block from the simulator over TCP
+* ``read``    - ``BITalino.read`` (receive + CRC + decode + loss accounting) over TCP
+
+The in-memory stages use synthetic frames or a recorded byte stream (``--stream``). The TCP
+stages start ``Task2.simulator`` in flood mode, so they measure the client, not the device rate.
+For each configuration the samples/s, latency per call, CPU% and peak bytes allocated per call
+are written to a JSON file so regressions in the decode path can be compared between runs.
+
+Example::
+
+    python -m Task2.benchmark --channels 1 6 --samples 100 1000 --output bench_task2.json
+"""
+
+import argparse
+import json
+import platform
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from Task2.bitalino import BITalino, crc4, decodeFrames
+from Task2.simulator import encode_frames, frame_size
+
+
+def synthetic_frames(n_channels, n_frames, seed=0):
+    """
+    Random valid frames with consecutive sequence numbers.
+    """
+    rng = np.random.default_rng(seed)
+    analog = rng.integers(0, 1024, (n_frames, n_channels))
+    analog[:, 4:] &= 0x3F
+    digital = rng.integers(0, 2, (n_frames, 4))
+    return encode_frames(np.arange(n_frames) & 0x0F, digital, analog)
+
+
+def recorded_frames(path, n_channels):
+    """
+    Frames from a raw byte stream recorded from a device (trailing partial frame is ignored).
+    """
+    raw = np.fromfile(path, dtype=np.uint8)
+    size = frame_size(n_channels)
+    return raw[: len(raw) // size * size].reshape(-1, size)
+
+
+def measure(function, calls, samples_per_call):
+    """
+    Calls `function` `calls` times and returns the throughput, latency, CPU and allocation figures.
+    """
+    function()                                          # Warm up
+    latencies = np.zeros(calls)
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for i in range(calls):
+        start = time.perf_counter()
+        function()
+        latencies[i] = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+
+    # Allocations are traced in a separate pass, tracemalloc slows the calls down
+    tracemalloc.start()
+    peaks = []
+    for i in range(min(calls, 10)):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        function()
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    return {
+        "samples_per_s": calls * samples_per_call / wall,
+        "latency_mean_ms": 1000 * float(np.mean(latencies)),
+        "latency_p95_ms": 1000 * float(np.percentile(latencies, 95)),
+        "cpu_percent": 100 * cpu / wall,
+        "peak_alloc_bytes": int(np.max(peaks)),
+    }
+
+
+def bench_memory(frames, n_channels, n_samples, calls):
+    blocks = [frames[i:i + n_samples] for i in range(0, len(frames) - n_samples + 1, n_samples)]
+    counter = {"i": 0}
+
+    def next_block():
+        counter["i"] = (counter["i"] + 1) % len(blocks)
+        return blocks[counter["i"]]
+
+    return {
+        "crc": measure(lambda: crc4(next_block()), calls, n_samples),
+        "decode": measure(lambda: decodeFrames(next_block(), n_channels), calls, n_samples),
+    }
+
+
+def bench_device(address, n_channels, n_samples, calls):
+    device = BITalino(address, timeout=5)
+    device.start(1000, list(range(n_channels)))
+    try:
+        size = n_samples * frame_size(n_channels)
+        return {
+            "receive": measure(lambda: device.receive(size), calls, n_samples),
+            "read": measure(lambda: device.read(n_samples, strict=False), calls, n_samples),
+        }
+    finally:
+        device.stop()
+        device.close()
+
+
+def start_simulator():
+    """
+    Starts the simulator in flood mode on a free port and returns the process and its address.
+    """
+    probe = socket.socket()
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    process = subprocess.Popen([sys.executable, "-u", "-m", "Task2.simulator", "--port", str(port), "--flood"],
+                               stdout=subprocess.PIPE)
+    process.stdout.readline()                           # Wait until it is listening
+    return process, "127.0.0.1:%d" % port
+
+
+def run(channels, samples, calls, stream=None, device=True):
+    simulator = None
+    if device:
+        simulator, address = start_simulator()
+    results = []
+    try:
+        for n_channels in channels:
+            if stream is None:
+                frames = synthetic_frames(n_channels, 2 * max(samples))
+            else:
+                frames = recorded_frames(stream, n_channels)
+            for n_samples in samples:
+                stages = bench_memory(frames, n_channels, n_samples, calls)
+                if device:
+                    stages.update(bench_device(address, n_channels, n_samples, calls))
+                for stage, figures in stages.items():
+                    results.append(dict(stage=stage, channels=n_channels, n_samples=n_samples, **figures))
+                    print("%-8s %d ch  nSamples=%-5d %12.0f samples/s  %8.3f ms/call  %5.1f%% CPU" % (
+                        stage, n_channels, n_samples, figures["samples_per_s"], figures["latency_mean_ms"],
+                        figures["cpu_percent"]))
+    finally:
+        if simulator is not None:
+            simulator.kill()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BITalino acquisition throughput benchmark")
+    parser.add_argument("--channels", type=int, nargs="+", default=[1, 2, 4, 6])
+    parser.add_argument("--samples", type=int, nargs="+", default=[10, 100, 500, 1000])
+    parser.add_argument("--calls", type=int, default=200, help="calls measured per stage and configuration")
+    parser.add_argument("--stream", default=None, help="recorded raw byte stream to use instead of synthetic frames")
+    parser.add_argument("--no-device", action="store_true", help="skip the TCP stages (receive/read)")
+    parser.add_argument("--output", default="bench_task2.json")
+    args = parser.parse_args()
+
+    results = run(args.channels, args.samples, args.calls, args.stream, not args.no_device)
+    with open(args.output, "w") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, f, indent=2)
+    print("Results written to " + args.output)
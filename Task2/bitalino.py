@@ -28,6 +28,7 @@ import select
 import socket
 import struct
 import sys
+import threading
 import time
 
 import numpy
@@ -51,6 +52,44 @@ def find():
         raise Exception(ExceptionCode.INVALID_PLATFORM)
 
 
+def _crc4Table():
+    """
+    :returns: (16, 256) array with the next CRC4 state for every (state, byte) pair
+
+    Precomputes the bit-by-bit CRC4 (polynomial x^4 + x + 1) used by BITalino frames, so the CRC of a frame
+    costs one table lookup per byte instead of eight shift/xor steps.
+    """
+    table = numpy.zeros((16, 256), dtype=numpy.uint8)
+    for state in range(16):
+        for byte in range(256):
+            x = state
+            for bit in range(7, -1, -1):
+                x = x << 1
+                if x & 0x10:
+                    x = x ^ 0x03
+                x = x ^ ((byte >> bit) & 0x01)
+            table[state, byte] = x & 0x0F
+    return table
+
+
+CRC4_TABLE = _crc4Table()
+
+
+def crc4(frames):
+    """
+    :param frames: frames to check, one frame per line
+    :type frames: array of uint8 with shape (nFrames, number_bytes)
+    :returns: array with the CRC4 of each frame
+
+    Computes the CRC4 of every frame at once. The 4 CRC bits (low nibble of the last byte) are ignored in the calculation.
+    """
+    frames = numpy.asarray(frames, dtype=numpy.uint8)
+    x = numpy.zeros(frames.shape[0], dtype=numpy.uint8)
+    for i in range(frames.shape[1] - 1):
+        x = CRC4_TABLE[x, frames[:, i]]
+    return CRC4_TABLE[x, frames[:, -1] & 0xF0]
+
+
 class ExceptionCode:
     INVALID_ADDRESS = "The specified address is invalid."
     INVALID_PLATFORM = "This platform does not support bluetooth connection."
@@ -62,6 +101,231 @@ class ExceptionCode:
     IMPORT_FAILED = "Please connect using the Virtual COM Port or confirm that PyBluez is installed; bluetooth wrapper failed to import with error: "
 
 
+def decodeFrames(frames, nChannels):
+    """
+    :param frames: frames received from the device, one frame per line
+    :type frames: array of uint8 with shape (nFrames, number_bytes)
+    :param nChannels: number of analog channels being acquired
+    :type nChannels: int
+    :returns: array with the decoded samples, organized as in :meth:`BITalino.read`
+
+    Extracts the sequence number, digital and analog channels of every frame at once. The CRC is not checked (see :func:`crc4`).
+    """
+    # Widen to int before shifting so the analog fields don't overflow uint8
+    frames = numpy.asarray(frames).astype(int)
+    # Prepare data array
+    dataAcquired = numpy.zeros((len(frames), 5 + nChannels), dtype=int)
+    # Digital Channels acquirement
+    dataAcquired[:, 0] = frames[:, -1] >> 4
+    dataAcquired[:, 1] = frames[:, -2] >> 7 & 0x01
+    dataAcquired[:, 2] = frames[:, -2] >> 6 & 0x01
+    dataAcquired[:, 3] = frames[:, -2] >> 5 & 0x01
+    dataAcquired[:, 4] = frames[:, -2] >> 4 & 0x01
+    # Analog channels acquirement
+    if nChannels > 0:
+        dataAcquired[:, 5] = ((frames[:, -2] & 0x0F) << 6) | (frames[:, -3] >> 2)
+    if nChannels > 1:
+        dataAcquired[:, 6] = ((frames[:, -3] & 0x03) << 8) | frames[:, -4]
+    if nChannels > 2:
+        dataAcquired[:, 7] = (frames[:, -5] << 2) | (frames[:, -6] >> 6)
+    if nChannels > 3:
+        dataAcquired[:, 8] = ((frames[:, -6] & 0x3F) << 4) | (frames[:, -7] >> 4)
+    if nChannels > 4:
+        dataAcquired[:, 9] = ((frames[:, -7] & 0x0F) << 2) | (frames[:, -8] >> 6)
+    if nChannels > 5:
+        dataAcquired[:, 10] = frames[:, -8] & 0x3F
+    return dataAcquired
+
+
+def sequenceGaps(sequence, previous=None):
+    """
+    :param sequence: sequence numbers (column 0 of :meth:`BITalino.read`)
+    :type sequence: array of int
+    :param previous: sequence number of the sample received just before `sequence` (None if unknown)
+    :type previous: int or None
+    :returns: array with the number of samples lost immediately before each sample
+
+    Detects gaps in the 4-bit sequence number, which overflows at 15. Gaps of 16 samples or more can only be detected modulo 16.
+    """
+    sequence = numpy.asarray(sequence, dtype=int)
+    if len(sequence) == 0:
+        return numpy.zeros(0, dtype=int)
+    if previous is None:
+        previous = sequence[0] - 1
+    return (numpy.diff(sequence, prepend=previous) - 1) % 16
+
+
+def findAlignment(data, nBytes, start=0, nFrames=3):
+    """
+    :param data: bytes received from the device
+    :type data: array of uint8
+    :param nBytes: number of bytes per frame
+    :type nBytes: int
+    :param start: first byte offset to test
+    :type start: int
+    :param nFrames: number of consecutive frames that must be valid
+    :type nFrames: int
+    :returns: first byte offset (>= `start`) where `nFrames` consecutive frames pass the CRC check and have consecutive sequence numbers, or None
+
+    Used to find the frame boundaries again after bytes were lost on the link (see ``strict=False`` in :meth:`BITalino.read`).
+    A random offset passes the test with probability of about ``16 ** -(2 * nFrames - 1)``.
+    """
+    data = numpy.asarray(data, dtype=numpy.uint8)
+    last = len(data) - nFrames * nBytes                 # Last offset with nFrames complete frames
+    if last < start:
+        return None
+    # Candidate frame at every byte offset
+    windows = numpy.lib.stride_tricks.sliding_window_view(data, nBytes)
+    valid = (windows[:, -1] & 0x0F) == crc4(windows)
+    sequence = windows[:, -1].astype(int) >> 4
+    offsets = numpy.arange(start, last + 1)
+    aligned = valid[offsets].copy()
+    for k in range(1, nFrames):
+        aligned &= valid[offsets + k * nBytes]
+        aligned &= (sequence[offsets + k * nBytes] - sequence[offsets + (k - 1) * nBytes]) % 16 == 1
+    found = numpy.flatnonzero(aligned)
+    return int(offsets[found[0]]) if len(found) else None
+
+
+def fillGaps(data, lost, method="nan", previousSample=None):
+    """
+    :param data: samples as returned by :meth:`BITalino.read`
+    :type data: array
+    :param lost: number of samples lost before each sample (see :func:`sequenceGaps`)
+    :type lost: array of int
+    :param method: ``"nan"`` to fill the lost samples with NaN, ``"interpolate"`` to interpolate the analog channels linearly and hold the digital channels
+    :type method: str
+    :param previousSample: last sample of the previous block, used to interpolate over a gap at the start of `data`
+    :type previousSample: array or None
+    :returns: float array with one line per sample, received or lost, and consecutive sequence numbers
+    :raises Exception: invalid method
+    """
+    if method not in ["nan", "interpolate"]:
+        raise Exception(ExceptionCode.INVALID_PARAMETER)
+    data = numpy.asarray(data, dtype=float)
+    lost = numpy.asarray(lost, dtype=int)
+    if len(data) == 0:
+        return data
+    positions = numpy.arange(len(data)) + numpy.cumsum(lost)       # Line of each received sample in the output
+    filled = numpy.full((positions[-1] + 1, data.shape[1]), numpy.nan)
+    filled[positions] = data
+    filled[:, 0] = (data[0, 0] - positions[0] + numpy.arange(len(filled))) % 16
+    if method == "interpolate" and len(filled) > len(data):
+        known = positions
+        values = data
+        if previousSample is not None:
+            known = numpy.concatenate(([-1], positions))
+            values = numpy.vstack((previousSample, data))
+        missing = numpy.setdiff1d(numpy.arange(len(filled)), positions)
+        # Digital channels hold the last received value, analog channels are interpolated
+        hold = numpy.searchsorted(known, missing) - 1
+        for column in range(1, data.shape[1]):
+            if column < 5:
+                filled[missing, column] = values[numpy.maximum(hold, 0), column]
+            else:
+                filled[missing, column] = numpy.interp(missing, known, values[:, column])
+    return filled
+
+
+class RingBuffer(object):
+    """
+    :param capacity: number of samples kept in memory
+    :type capacity: int
+    :param nColumns: number of columns of each sample (see :meth:`BITalino.read`)
+    :type nColumns: int
+
+    Preallocated circular buffer of samples filled by a single writer thread (see :meth:`BITalino.startStream`).
+
+    The writer first advances :attr:`reserved` past the block, then copies it into place and only then advances
+    :attr:`written`, so readers never take a lock: they copy the range they want and afterwards discard every sample whose
+    slot the writer had reserved meanwhile. Samples that are overwritten before :meth:`read` gets to them are counted in
+    :attr:`overruns`; :meth:`latest` only peeks and never changes it.
+
+    Consumers can either poll the most recent samples with :meth:`latest` or iterate over the buffer to get every new block
+    as it arrives, until the stream is closed.
+    """
+
+    pollInterval = 0.01
+
+    def __init__(self, capacity, nColumns, dtype=int):
+        if int(capacity) < 1:
+            raise Exception(ExceptionCode.INVALID_PARAMETER)
+        self.capacity = int(capacity)
+        self.data = numpy.zeros((self.capacity, nColumns), dtype=dtype)
+        self.written = 0        # Total number of samples written since the buffer was created
+        self.reserved = 0       # Samples written plus the block being copied (its slots may hold torn data)
+        self.overruns = 0       # Samples lost because a reader fell more than `capacity` samples behind
+        self.closed = False
+
+    def write(self, block):
+        """
+        Appends `block` (one sample per line) to the buffer, overwriting the oldest samples. Only one thread may write.
+        """
+        n = len(block)
+        end = self.written + n
+        if n > self.capacity:
+            block = block[-self.capacity :]
+            n = self.capacity
+        self.reserved = end     # Announce the slots about to be overwritten before touching them
+        start = (end - n) % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start : start + first] = block[:first]
+        self.data[: n - first] = block[first:]
+        self.written = end      # Publish the samples only after they are in place
+
+    def close(self):
+        """
+        Marks the end of the stream; iterators stop once they have consumed the remaining samples.
+        """
+        self.closed = True
+
+    def latest(self, n):
+        """
+        :param n: number of samples
+        :type n: int
+        :returns: array with (at most) the `n` most recent samples, oldest first
+        """
+        end = self.written
+        return self._copy(end - min(int(n), end, self.capacity), end, count=False)
+
+    def read(self, position):
+        """
+        :param position: number of samples already consumed by the caller (``0`` for every sample since the buffer was created)
+        :type position: int
+        :returns: tuple with the array of samples written since `position` and the new position
+
+        Samples that were overwritten before being read are skipped and added to :attr:`overruns`.
+        """
+        end = self.written
+        if position < end - self.capacity:
+            self.overruns += end - self.capacity - position
+            position = end - self.capacity
+        block = self._copy(position, end)
+        return block, end
+
+    def __iter__(self):
+        position = self.written
+        while True:
+            closed = self.closed
+            block, position = self.read(position)
+            if len(block):
+                yield block
+            elif closed:
+                return
+            else:
+                time.sleep(self.pollInterval)
+
+    def _copy(self, start, end, count=True):
+        block = self.data[numpy.arange(start, end) % self.capacity]
+        # The writer may have reserved (and started to overwrite) the start of the range while it was being copied
+        lost = self.reserved - self.capacity - start
+        if lost > 0:
+            if count:
+                self.overruns += min(lost, end - start)
+            block = block[lost:]
+        return block
+
+
 class BITalino(object):
     """
     :param macAddress: MAC address or serial port for the bluetooth device
@@ -139,6 +403,17 @@ class BITalino(object):
         else:
             raise Exception(ExceptionCode.INVALID_ADDRESS)                          # Exception if invalid adress
         
+        # Reusable receive buffer; bytes received beyond a request are kept between calls (see receiveInto)
+        self._rxBuffer = bytearray(4096)
+        self._rxView = memoryview(self._rxBuffer)
+        self._rxStart = 0
+        self._rxEnd = 0
+
+        # Corrupted frame counters (see read)
+        self.corruptedFrames = 0
+        self.corruptedIndices = numpy.zeros(0, dtype=int)
+        self.resyncs = 0
+
         # Version Check
         self.started = False
         self.macAddress = macAddress
@@ -236,6 +511,13 @@ class BITalino(object):
 
             self.send(commandStart)
 
+            # Reset the sample loss accounting (see read)
+            self.samplesReceived = 0
+            self.samplesLost = 0
+            self.gaps = 0
+            self._lastSequence = None
+            self._lastSample = None
+
             # Marking Acquisition as Started
             self.started = True
             self.analogChannels = analogChannels
@@ -259,6 +541,7 @@ class BITalino(object):
             else:
                 raise Exception(ExceptionCode.DEVICE_NOT_IN_ACQUISITION)            # Raising exception in case device is already idle
         self.started = False
+        self._rxStart = self._rxEnd = 0                                             # Discard buffered frames of the stopped acquisition
 
     def close(self):
         """
@@ -272,8 +555,8 @@ class BITalino(object):
                 # Fechar o socket
                 self.socket.shutdown(socket.SHUT_RDWR)          # Desativa o envio e recepção de dado
                 self.socket.close()                             # Fecha o socket definitivamente
-            # tentativa de receive(1024) travar devido a um timeout
-            except socket.timeout:
+            # tentativa de receive(1024) travar devido a um timeout (socket.timeout, ou Exception quando há timeout definido)
+            except Exception:
                 self.socket.shutdown(socket.SHUT_RDWR)
                 self.socket.close()
         # Caso bluetooth ou serial port
@@ -388,13 +671,7 @@ class BITalino(object):
                 # Verificar a integridade dos dados
                 crc = decodedData[-1] & 0x0F
                 decodedData[-1] = decodedData[-1] & 0xF0
-                x = 0
-                for i in range(number_bytes):
-                    for bit in range(7, -1, -1):
-                        x = x << 1
-                        if x & 0x10:
-                            x = x ^ 0x03
-                        x = x ^ ((decodedData[i] >> bit) & 0x01)
+                x = int(crc4([decodedData])[0])
                 # Extrair informação dos canais analógicos e digitais
                 if crc == x & 0x0F:
                     digitalPorts = []
@@ -489,13 +766,17 @@ class BITalino(object):
                 data = data | j << (2 + i)
             self.send(data)
 
-    def read(self, nSamples=100):
+    def read(self, nSamples=100, strict=True, fill=None):
         """
         :param nSamples: number of samples to acquire
         :type nSamples: int
+        :param strict: raise an exception when a corrupted frame is received
+        :type strict: bool
+        :param fill: None to return only the received samples, ``"nan"`` or ``"interpolate"`` to insert lines for lost samples (see :func:`fillGaps`)
+        :type fill: str or None
         :returns: array with the acquired data
         :raises Exception: device not in acquisition (in IDLE)
-        :raises Exception: lost communication with the device when data is corrupted
+        :raises Exception: lost communication with the device when data is corrupted (only if *strict*)
 
         Acquires `nSamples` from BITalino. Reading samples from BITalino implies the use of the method :meth:`receive`.
 
@@ -522,6 +803,18 @@ class BITalino(object):
         ==================  ========= ========= ========= ========= ======== ======== ========
 
         .. note:: *The sequence number overflows at 15
+
+        With ``strict=False`` frames that fail the CRC check are left out of the returned matrix instead of aborting the acquisition,
+        so it may have less than `nSamples` lines. The indices (within the block) of the frames left out in the last call are kept in
+        :attr:`corruptedIndices` and the total number of corrupted frames since the connection was opened in :attr:`corruptedFrames`.
+        If the last frames of the block are not valid and consecutive (bytes were lost, so every later frame is shifted), the
+        frame boundaries are searched again from the first corrupted frame (see :func:`findAlignment`): only the samples before
+        it are returned, and the bytes from the new boundary on are kept for the next call. :attr:`resyncs` counts these events;
+        only the frames dropped by the resync (the first corrupted one and, if its sequence number does not follow, the frame
+        before it) are counted as corrupted.
+
+        Gaps in the sequence number (lost or corrupted frames) are counted across calls, see :meth:`lossStatistics`.
+        With *fill* set, the lost samples are inserted in the returned (float) matrix, which then has consecutive sequence numbers.
         """
         # Check if data aquisition as alerady started
         if self.started:
@@ -534,54 +827,172 @@ class BITalino(object):
             else:
                 number_bytes = int(math.ceil((52.0 + 6.0 * (nChannels - 4)) / 8.0))
 
-            # Prepare data array
-            dataAcquired = numpy.zeros((nSamples, 5 + nChannels), dtype=int)
-            # Loop to read each sample
-            for sample in range(nSamples):
-                Data = self.receive(number_bytes) # Read the required number of bytes from the device
-                decodedData = list(struct.unpack(number_bytes * "B ", Data)) # convert the binary data into list of integers
-                # CRC (Cyclic Redundancy Check) Calculation
-                crc = decodedData[-1] & 0x0F
-                decodedData[-1] = decodedData[-1] & 0xF0
-                x = 0
-                for i in range(number_bytes):
-                    for bit in range(7, -1, -1):
-                        x = x << 1
-                        if x & 0x10:
-                            x = x ^ 0x03
-                        x = x ^ ((decodedData[i] >> bit) & 0x01)
-                # Digital Channels acquirement
-                if crc == x & 0x0F:
-                    dataAcquired[sample, 0] = decodedData[-1] >> 4
-                    dataAcquired[sample, 1] = decodedData[-2] >> 7 & 0x01
-                    dataAcquired[sample, 2] = decodedData[-2] >> 6 & 0x01
-                    dataAcquired[sample, 3] = decodedData[-2] >> 5 & 0x01
-                    dataAcquired[sample, 4] = decodedData[-2] >> 4 & 0x01
-                    # Analog channels acquirement
-                    if nChannels > 0:
-                        dataAcquired[sample, 5] = ((decodedData[-2] & 0x0F) << 6) | (
-                            decodedData[-3] >> 2
-                        )
-                    if nChannels > 1:
-                        dataAcquired[sample, 6] = ((decodedData[-3] & 0x03) << 8) | decodedData[-4]
-                    if nChannels > 2:
-                        dataAcquired[sample, 7] = (decodedData[-5] << 2) | (decodedData[-6] >> 6)
-                    if nChannels > 3:
-                        dataAcquired[sample, 8] = ((decodedData[-6] & 0x3F) << 4) | (
-                            decodedData[-7] >> 4
-                        )
-                    if nChannels > 4:
-                        dataAcquired[sample, 9] = ((decodedData[-7] & 0x0F) << 2) | (
-                            decodedData[-8] >> 6
-                        )
-                    if nChannels > 5:
-                        dataAcquired[sample, 10] = decodedData[-8] & 0x3F
-                else:
+            # Read the whole block at once straight into a (nSamples, number_bytes) matrix of bytes
+            decodedData = numpy.empty((nSamples, number_bytes), dtype=numpy.uint8)
+            self.receiveInto(decodedData)
+            # CRC (Cyclic Redundancy Check) validation of every frame in the block
+            valid = (decodedData[:, -1] & 0x0F) == crc4(decodedData)
+            if not valid.all():
+                self.corruptedIndices = numpy.flatnonzero(~valid)
+                if strict:
+                    self.corruptedFrames += len(self.corruptedIndices)
                     raise Exception(ExceptionCode.CONTACTING_DEVICE)
+                if self._aligned(decodedData, valid):
+                    decodedData = decodedData[valid]                  # Mask out the corrupted frames
+                else:
+                    # Only the frames actually dropped count; the shifted ones are pushed back and decoded by the next call
+                    firstCorrupted = self.corruptedIndices[0]
+                    decodedData = self._resync(decodedData, firstCorrupted)
+                    self.corruptedIndices = numpy.arange(len(decodedData), firstCorrupted + 1)
+                self.corruptedFrames += len(self.corruptedIndices)
+            else:
+                self.corruptedIndices = numpy.zeros(0, dtype=int)
+            dataAcquired = decodeFrames(decodedData, nChannels)
+            # Sequence number gaps and sample loss accounting
+            if len(dataAcquired) > 0:
+                lost = sequenceGaps(dataAcquired[:, 0], self._lastSequence)
+                self.samplesReceived += len(dataAcquired)
+                self.samplesLost += int(lost.sum())
+                self.gaps += int(numpy.count_nonzero(lost))
+                previousSample = self._lastSample
+                self._lastSequence = dataAcquired[-1, 0]
+                self._lastSample = dataAcquired[-1]
+                if fill is not None:
+                    dataAcquired = fillGaps(dataAcquired, lost, fill, previousSample)
+            elif fill is not None:
+                dataAcquired = dataAcquired.astype(float)
             return dataAcquired
         else:
             raise Exception(ExceptionCode.DEVICE_NOT_IN_ACQUISITION)
 
+    def _aligned(self, frames, valid, nFrames=3):
+        """
+        Whether the last `nFrames` frames of a block are valid and have consecutive sequence numbers, i.e. the corrupted frames
+        of the block did not shift the frame boundaries.
+        """
+        if len(frames) < nFrames:
+            return bool(valid[-1])
+        sequence = frames[-nFrames:, -1].astype(int) >> 4
+        return bool(valid[-nFrames:].all() and (numpy.diff(sequence) % 16 == 1).all())
+
+    def _resync(self, frames, firstCorrupted, nFrames=3):
+        """
+        Returns the frames before `firstCorrupted` and puts back in the receive buffer the bytes from the next frame boundary
+        found after it (or, if none is found, the bytes that could still start one), so the next read starts aligned.
+        """
+        nBytes = frames.shape[1]
+        data = frames.reshape(-1)
+        offset = findAlignment(data, nBytes, firstCorrupted * nBytes + 1, nFrames)
+        if offset is None:
+            offset = max(firstCorrupted * nBytes + 1, len(data) - nFrames * nBytes + 1)
+        else:
+            self.resyncs += 1
+        self._pushBack(data[offset:])
+        # The frame where the bytes were lost may still pass the 4-bit CRC; keep it only if its sequence number follows
+        kept = frames[:firstCorrupted]
+        if len(kept) > 1 and ((int(kept[-1, -1]) >> 4) - (int(kept[-2, -1]) >> 4)) % 16 != 1:
+            kept = kept[:-1]
+        return kept
+
+    def _pushBack(self, data):
+        """
+        Puts `data` back in front of the bytes pending in the receive buffer, growing it if needed.
+        """
+        data = bytes(data) + bytes(self._rxView[self._rxStart : self._rxEnd])
+        if len(data) > len(self._rxBuffer):
+            self._rxBuffer = bytearray(len(data))
+            self._rxView = memoryview(self._rxBuffer)
+        self._rxView[: len(data)] = data
+        self._rxStart = 0
+        self._rxEnd = len(data)
+
+    def lossStatistics(self):
+        """
+        :returns: dictionary with the sample loss statistics of the current acquisition
+
+        =================  ==============================================================
+        Key                Value
+        =================  ==============================================================
+        received           Number of samples received with a valid CRC
+        lost               Number of samples missing from the sequence numbers
+        gaps               Number of gaps (runs of consecutive lost samples)
+        lossRate           ``lost / (received + lost)``
+        =================  ==============================================================
+        """
+        total = self.samplesReceived + self.samplesLost
+        return {
+            "received": self.samplesReceived,
+            "lost": self.samplesLost,
+            "gaps": self.gaps,
+            "lossRate": float(self.samplesLost) / total if total else 0.0,
+        }
+
+    def startStream(self, SamplingRate=1000, analogChannels=[0, 1, 2, 3, 4, 5], window=10, nSamples=None, fill=None):
+        """
+        :param SamplingRate: sampling frequency (Hz), as in :meth:`start`
+        :type SamplingRate: int
+        :param analogChannels: channels to be acquired, as in :meth:`start`
+        :type analogChannels: array, tuple or list of int
+        :param window: number of seconds of signal kept in memory
+        :type window: int or float
+        :param nSamples: number of samples read per block by the reader thread (default: 100 ms of signal)
+        :type nSamples: int or None
+        :param fill: insert lost samples in the buffer, as in :meth:`read`
+        :type fill: str or None
+        :returns: :class:`RingBuffer` filled by the reader thread
+        :raises Exception: device already in acquisition (not IDLE)
+
+        Starts the acquisition and a dedicated reader thread that decodes blocks of samples into a preallocated
+        :class:`RingBuffer` of ``SamplingRate * window`` samples, so the acquisition never waits for the caller.
+        Corrupted frames are dropped (see ``strict=False`` in :meth:`read`).
+
+        Use :meth:`latest` or iterate over the returned buffer to consume the samples, and :meth:`stopStream` to stop.
+        """
+        self.start(SamplingRate, analogChannels)
+        if nSamples is None:
+            nSamples = max(1, int(SamplingRate) // 10)
+        self.ring = RingBuffer(int(SamplingRate) * window, 5 + len(self.analogChannels), dtype=int if fill is None else float)
+        self.streamError = None
+        self._streamRunning = threading.Event()
+        self._streamRunning.set()
+        self._streamThread = threading.Thread(target=self._streamLoop, args=(int(nSamples), fill))
+        self._streamThread.daemon = True
+        self._streamThread.start()
+        return self.ring
+
+    def _streamLoop(self, nSamples, fill):
+        try:
+            while self._streamRunning.is_set():
+                self.ring.write(self.read(nSamples, strict=False, fill=fill))
+        except Exception as e:
+            self.streamError = e                            # Reported by stopStream
+        finally:
+            self.ring.close()
+
+    def stopStream(self):
+        """
+        :raises Exception: device not streaming
+        :raises Exception: the reader thread stopped because of an error (e.g. lost communication with the device)
+
+        Stops the reader thread started by :meth:`startStream` and the acquisition. Samples already in the buffer remain available.
+        """
+        if getattr(self, "_streamThread", None) is None:
+            raise Exception(ExceptionCode.DEVICE_NOT_IN_ACQUISITION)
+        self._streamRunning.clear()
+        self._streamThread.join()                           # Waits for the block being read
+        self._streamThread = None
+        self.stop()
+        if self.streamError is not None:
+            raise self.streamError
+
+    def latest(self, n=1000):
+        """
+        :param n: number of samples
+        :type n: int
+        :returns: array with (at most) the `n` most recent samples acquired by :meth:`startStream`, in the format of :meth:`read`
+        """
+        return self.ring.latest(n)
+
     def version(self):
         """
         :returns: str with the version of BITalino
@@ -616,30 +1027,72 @@ class BITalino(object):
 
         Retrieves `nbytes` from the BITalino device and returns it as a string pack with length of `nbytes`. The timeout is defined on instantiation.
         """
-        if self.isPython2:
-            data = ""
-        else:
-            data = b""
+        data = bytearray(nbytes)
+        self.receiveInto(data)
+        return bytes(data)
+
+    def receiveInto(self, buffer):
+        """
+        :param buffer: writable buffer to fill (e.g. ``bytearray`` or contiguous ``numpy.uint8`` array)
+        :type buffer: bytearray, memoryview or array
+        :returns: number of bytes written, always ``len(buffer)`` in bytes
+        :raises Exception: lost communication with the device when timeout is reached or the connection is closed
+
+        Retrieves as many bytes from the BITalino device as needed to fill `buffer`, without intermediate copies for large requests.
+        Each system call reads as many bytes as are available; bytes received beyond the request are kept for the next call.
+        The timeout (defined on instantiation) applies to each wait for new data.
+        """
+        view = memoryview(buffer)
+        if view.ndim != 1 or view.format != "B":
+            view = view.cast("B")
+        nbytes = len(view)
+        filled = 0
+        while filled < nbytes:
+            # Serve pending bytes from the receive buffer first
+            pending = self._rxEnd - self._rxStart
+            if pending > 0:
+                n = min(pending, nbytes - filled)
+                view[filled : filled + n] = self._rxView[self._rxStart : self._rxStart + n]
+                self._rxStart += n
+                filled += n
+            # Large requests are read straight into the caller's buffer
+            elif nbytes - filled >= len(self._rxBuffer):
+                filled += self._readAvailable(view[filled:])
+            # Small requests refill the receive buffer, keeping the surplus for later calls
+            else:
+                self._rxStart = 0
+                self._rxEnd = self._readAvailable(self._rxView)
+        return nbytes
+
+    def _readAvailable(self, view):
+        """
+        Waits (honouring the timeout) until data is available and reads as much as is available, up to ``len(view)`` bytes, into `view`.
+        Returns the number of bytes read.
+        """
         if self.serial:
-            while len(data) < nbytes:
-                if not self.blocking:
-                    initTime = time.time()
-                    while self.socket.inWaiting() < 1:
-                        finTime = time.time()
-                        if (finTime - initTime) > self.timeout:
-                            raise Exception(ExceptionCode.CONTACTING_DEVICE)
-                data += self.socket.read(1)
-        else:
-            while len(data) < nbytes:
-                if not self.blocking:
-                    ready = select.select([self.socket], [], [], self.timeout)
-                    if ready[0]:
-                        pass
-                    else:
+            if not self.blocking:
+                initTime = time.time()
+                while self.socket.inWaiting() < 1:
+                    finTime = time.time()
+                    if (finTime - initTime) > self.timeout:
                         raise Exception(ExceptionCode.CONTACTING_DEVICE)
-                data += self.socket.recv(1)
-        return data
-
+            n = max(1, min(len(view), self.socket.inWaiting()))
+            n = self.socket.readinto(view[:n])
+        else:
+            if not self.blocking:
+                ready = select.select([self.socket], [], [], self.timeout)
+                if not ready[0]:
+                    raise Exception(ExceptionCode.CONTACTING_DEVICE)
+            if hasattr(self.socket, "recv_into"):
+                n = self.socket.recv_into(view, len(view))
+            else:
+                # Bluetooth sockets without recv_into (e.g. some PyBluez backends)
+                chunk = self.socket.recv(len(view))
+                n = len(chunk)
+                view[:n] = chunk
+        if not n:
+            raise Exception(ExceptionCode.CONTACTING_DEVICE)                        # Connection closed by the device
+        return n
 
 if __name__ == "__main__":
     macAddress = "00:00:00:00:00:00"
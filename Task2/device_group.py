@@ -0,0 +1,122 @@
+"""
+Concurrent acquisition from several BITalino devices with a shared clock.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from Task2.bitalino import BITalino
+
+
+class DeviceGroup(object):
+    """
+    Opens one ``BITalino`` connection per address and acquires from all of them at the same time,
+    one reader thread per device (the reads block on the sockets, so the threads run in parallel).
+
+    Every block is timestamped against a single ``time.monotonic`` clock when it is received, which
+    is used to place the samples of all devices on a common time axis (see ``align``).
+    """
+
+    def __init__(self, mac_addresses, timeout=None):
+        self.mac_addresses = list(mac_addresses)
+        self.devices = [None] * len(self.mac_addresses)
+        self.sampling_rate = None
+        errors = [None] * len(self.mac_addresses)
+
+        def connect(i):
+            try:
+                self.devices[i] = BITalino(self.mac_addresses[i], timeout)
+            except Exception as e:
+                errors[i] = e
+
+        # Bluetooth connections take a few seconds each, so they are also opened concurrently
+        self._run_all(connect)
+        self._raise_errors(errors)
+
+    def _raise_errors(self, errors):
+        failed = [mac + ": " + str(error) for mac, error in zip(self.mac_addresses, errors) if error is not None]
+        if failed:
+            self.close()
+            raise Exception("; ".join(failed))
+
+    def _run_all(self, target):
+        threads = [threading.Thread(target=target, args=(i,)) for i in range(len(self.devices))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def battery(self, value=0):
+        for device in self.devices:
+            device.battery(value)
+
+    def start(self, sampling_rate=1000, analog_channels=[0, 1, 2, 3, 4, 5]):
+        for device in self.devices:
+            device.start(sampling_rate, analog_channels)
+        self.sampling_rate = sampling_rate
+
+    def acquire(self, duration, n_samples=100):
+        """
+        Reads blocks of `n_samples` from every device concurrently for `duration` seconds.
+
+        Returns a list with, for each device, the list of ``(timestamp, block)`` pairs received, where
+        `timestamp` is the monotonic time at which the block was complete. Lost samples are filled
+        with NaN (see ``BITalino.read``) so that sample counts map to time.
+        """
+        blocks = [[] for _ in self.devices]
+        errors = [None] * len(self.devices)
+        end = time.monotonic() + duration
+
+        def reader(i):
+            try:
+                while time.monotonic() < end:
+                    data = self.devices[i].read(n_samples, strict=False, fill="nan")
+                    blocks[i].append((time.monotonic(), data))
+            except Exception as e:
+                errors[i] = e
+
+        self._run_all(reader)
+        self._raise_errors(errors)
+        return blocks
+
+    def align(self, blocks):
+        """
+        Places the blocks returned by ``acquire`` on a common time axis.
+
+        The time of the first sample of each device is estimated from the block that arrived with the
+        least delay, ``min(timestamp - (samples so far - 1) / sampling_rate)``, and every device is cut
+        to the interval covered by all of them.
+
+        Returns the array of sample times (monotonic clock, seconds) and a list with one array per
+        device, all with the same number of lines.
+        """
+        rate = float(self.sampling_rate)
+        anchors = []
+        signals = []
+        for device_blocks in blocks:
+            data = np.concatenate([block for _, block in device_blocks], axis=0)
+            counts = np.cumsum([len(block) for _, block in device_blocks])
+            timestamps = np.array([timestamp for timestamp, _ in device_blocks])
+            anchors.append(np.min(timestamps - (counts - 1) / rate))
+            signals.append(data)
+
+        start = max(anchors)
+        stop = min(anchor + (len(data) - 1) / rate for anchor, data in zip(anchors, signals))
+        n = max(0, int(np.floor((stop - start) * rate)) + 1)
+        aligned = []
+        for anchor, data in zip(anchors, signals):
+            offset = int(round((start - anchor) * rate))
+            aligned.append(data[offset:offset + n])
+        n = min(len(data) for data in aligned)
+        return start + np.arange(n) / rate, [data[:n] for data in aligned]
+
+    def stop(self):
+        for device in self.devices:
+            device.stop()
+
+    def close(self):
+        for device in self.devices:
+            if device is not None:
+                device.close()
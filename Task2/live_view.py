@@ -0,0 +1,76 @@
+"""
+Live view of a BITalino acquisition.
+
+The view polls the ring buffer filled by ``BITalino.startStream`` from a GUI timer, so plotting
+never blocks the reader thread, and draws at most two points (min and max) per horizontal pixel,
+so the rendering cost does not grow with the window or the recording length.
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+
+def minmax_decimate(signal, pixels):
+    """
+    Reduces `signal` to the minimum and maximum of each of `pixels` buckets, which keeps the
+    envelope (peaks included) of the plotted signal. Returns the sample indices and values,
+    ``2 * pixels`` points at most.
+    """
+    signal = np.asarray(signal, dtype=float)
+    n = len(signal)
+    if n <= 2 * pixels:
+        return np.arange(n), signal
+    bucket = int(np.ceil(n / float(pixels)))
+    padded = np.pad(signal, (0, -n % bucket), mode="edge").reshape(-1, bucket)
+    x = np.repeat(np.arange(len(padded)) * bucket, 2)
+    y = np.empty(2 * len(padded))
+    y[0::2] = padded.min(axis=1)
+    y[1::2] = padded.max(axis=1)
+    return x, y
+
+
+class LiveView(object):
+    """
+    Plots the last `window` samples of the given `columns` of `ring` (a ``RingBuffer``), one axis
+    per column, refreshed every `interval` milliseconds by a timer of the figure. The GUI event
+    loop must run on the main thread (e.g. ``plt.pause`` between steps of the caller).
+    """
+
+    def __init__(self, ring, columns, window, labels=None, pixels=1000, interval=200):
+        self.ring = ring
+        self.columns = list(columns)
+        self.window = window
+        self.pixels = pixels
+        self.figure, axes = plt.subplots(len(self.columns), 1, sharex=True, squeeze=False)
+        self.axes = axes[:, 0]
+        self.lines = [ax.plot([], [])[0] for ax in self.axes]
+        for ax, label in zip(self.axes, labels or [""] * len(self.columns)):
+            ax.set_ylabel(label)
+        self.timer = self.figure.canvas.new_timer(interval=interval)
+        self.timer.add_callback(self.update)
+
+    def update(self):
+        data = self.ring.latest(self.window)
+        for ax, line, column in zip(self.axes, self.lines, self.columns):
+            x, y = minmax_decimate(data[:, column], self.pixels)
+            line.set_data(x, y)
+            ax.relim()
+            ax.autoscale_view()
+        self.figure.canvas.draw_idle()
+
+    def start(self):
+        self.timer.start()
+        plt.show(block=False)
+
+    def stop(self):
+        self.timer.stop()
+        plt.close(self.figure)
+
+
+def plot_decimated(signal, pixels=2000):
+    """
+    Plots a (possibly memory-mapped) signal of any length with min/max decimation.
+    """
+    x, y = minmax_decimate(signal, pixels)
+    plt.plot(x, y)
+    plt.show()
@@ -1,9 +1,12 @@
 import time
 import numpy as np
 from Task2.bitalino import *
+from Task2.recording import Recorder, open_recording
+from Task2.device_group import DeviceGroup
+from Task2.live_view import LiveView, plot_decimated
 import matplotlib.pyplot as plt
 
-def get_signals():
+def get_signals(recording_path="acquisition.rec", plot=True):
 
     # Criar e inicializar variáceis necessárias
     macAdress="00:21:08:35:15:17"
@@ -23,39 +26,81 @@ def get_signals():
     # Definir threshold da bateria
     device.battery(batteryThreshold)
 
-    # Começar Aquisição
-    device.start(samplingRate, acqChannels)
+    # Começar Aquisição (uma thread dedicada lê o BITalino para um buffer circular de 10 s)
+    ring = device.startStream(samplingRate, acqChannels, window=10, nSamples=nSamples)
 
     # Aquisição
     start = time.time()
     end = time.time()
 
-    all_data=[]
+    # As amostras são gravadas diretamente em disco em vez de ficarem numa lista em memória
+    recorder = Recorder(recording_path, acqChannels, samplingRate)
+    position = 0
+
+    # Visualização em tempo real dos últimos 10 s (desativar com plot=False em execuções sem ecrã)
+    if plot:
+        view = LiveView(ring, [-2, -1], 10 * samplingRate, labels=["Oximetria", "EMG"])
+        view.start()
 
     while (end - start) < running_time:
-        # Read samples
-        data=device.read(nSamples)
-        all_data.append(data)  # Append the data to the list
+        # Recolher as amostras novas do buffer
+        if plot:
+            plt.pause(1)
+        else:
+            time.sleep(1)
+        data, position = ring.read(position)
+        recorder.append(data)  # Append the data to the recording
+        recorder.flush()       # Header atualizado a cada segundo: uma falha a meio não perde o que já está em disco
         end = time.time()
 
-    all_data = np.concatenate(all_data, axis=0)
+    # Parar acquisição
+    if plot:
+        view.stop()
+    device.stopStream()
+    data, position = ring.read(position)
+    recorder.append(data)
+    recorder.close()
+
+    # Ler a gravação (memory-mapped, sem carregar tudo em memória)
+    header, all_data = open_recording(recording_path)
 
-    # Plot da data adquirida através de Oximetria
-    plt.plot(all_data[:,-2])
-    plt.show()
+    print("Total de frames corrompidas:", device.corruptedFrames)
+    print("Amostras perdidas por overrun do buffer:", ring.overruns)
+    print("Perda de amostras (número de sequência):", device.lossStatistics())
 
-    # Plot da data adquirida através de Oximetria em um intervalo mais curto para facilitar a visualização do sinal
-    plt.plot(all_data[0:1000,-2])
-    plt.show()
+    if plot:
+        # Plot da data adquirida através de Oximetria
+        plot_decimated(all_data[:,-2])
 
-    # Plot da data adquirida através de EMG
-    plt.plot(all_data[:,-1])
-    plt.show()
+        # Plot da data adquirida através de Oximetria em um intervalo mais curto para facilitar a visualização do sinal
+        plot_decimated(all_data[0:1000,-2])
 
-    # Parar acquisição
-    device.stop()
+        # Plot da data adquirida através de EMG
+        plot_decimated(all_data[:,-1])
 
     # Desconectar Bitalino
     device.close()
 
-    return all_data
\ No newline at end of file
+    return all_data
+
+def get_signals_group(macAdresses, running_time=120):
+
+    # Vários BITalino por paciente, adquiridos em simultâneo e alinhados num relógio comum
+    batteryThreshold = 30
+    acqChannels = [0,1]
+    samplingRate = 100
+    nSamples = 100
+
+    group = DeviceGroup(macAdresses)
+    group.battery(batteryThreshold)
+    group.start(samplingRate, acqChannels)
+
+    blocks = group.acquire(running_time, nSamples)
+
+    group.stop()
+    group.close()
+
+    # Tempos das amostras e um array por dispositivo, todos com o mesmo número de linhas
+    timestamps, all_data = group.align(blocks)
+
+    return timestamps, all_data
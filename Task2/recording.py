@@ -0,0 +1,120 @@
+"""
+Recording of BITalino acquisitions straight to disk.
+
+A recording file has a fixed-size header followed by the samples, stored row by row as a
+C-ordered (n_samples, n_columns) array. The header is a JSON dictionary (padded with spaces)
+with the channels, sampling rate, start time, dtype and number of samples, so a recording
+can be memory-mapped back without reading the samples.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+MAGIC = b"BITREC1\n"
+HEADER_SIZE = 4096
+
+
+def _write_header(f, header):
+    raw = MAGIC + json.dumps(header).encode("utf-8")
+    if len(raw) > HEADER_SIZE:
+        raise ValueError("Recording header is larger than %d bytes" % HEADER_SIZE)
+    f.seek(0)
+    f.write(raw.ljust(HEADER_SIZE, b" "))
+
+
+def read_header(path):
+    """
+    Returns the header dictionary of the recording in `path`.
+    """
+    with open(path, "rb") as f:
+        raw = f.read(HEADER_SIZE)
+    if not raw.startswith(MAGIC):
+        raise ValueError("%s is not a BITalino recording" % path)
+    return json.loads(raw[len(MAGIC):].decode("utf-8"))
+
+
+class Recorder(object):
+    """
+    Appends blocks of samples (as returned by ``BITalino.read``) to a recording file.
+
+    The samples are written into a preallocated ``np.memmap`` that grows (doubling its size)
+    when it is full, so the acquisition is never kept in memory nor concatenated. The header is
+    updated on every ``flush`` and the file is truncated to the samples written on ``close``.
+    """
+
+    def __init__(self, path, analog_channels, sampling_rate, dtype="int16", initial_seconds=60):
+        self.path = path
+        self.header = {
+            "analog_channels": list(analog_channels),
+            "sampling_rate": sampling_rate,
+            "start_time": time.time(),
+            "n_columns": 5 + len(analog_channels),
+            "dtype": np.dtype(dtype).str,
+            "n_samples": 0,
+        }
+        self.n_samples = 0
+        self._file = open(path, "w+b")
+        _write_header(self._file, self.header)
+        self._map(max(1, int(sampling_rate * initial_seconds)))
+
+    def _map(self, capacity):
+        row_bytes = self.header["n_columns"] * np.dtype(self.header["dtype"]).itemsize
+        self._file.truncate(HEADER_SIZE + capacity * row_bytes)
+        self.capacity = capacity
+        self.data = np.memmap(self._file, dtype=self.header["dtype"], mode="r+", offset=HEADER_SIZE,
+                              shape=(capacity, self.header["n_columns"]))
+
+    def append(self, block):
+        """
+        Writes `block` (one sample per line) after the samples already recorded.
+        """
+        n = len(block)
+        if self.n_samples + n > self.capacity:
+            self.data.flush()
+            del self.data                               # The file can't be resized while mapped on Windows
+            self._map(max(2 * self.capacity, self.n_samples + n))
+        self.data[self.n_samples:self.n_samples + n] = block
+        self.n_samples += n
+
+    def flush(self):
+        """
+        Flushes the samples and the header to disk.
+        """
+        self.data.flush()
+        self.header["n_samples"] = self.n_samples
+        _write_header(self._file, self.header)
+        self._file.flush()
+
+    def close(self):
+        """
+        Flushes the recording and truncates the file to the samples written.
+        """
+        if self._file.closed:
+            return
+        self.flush()
+        del self.data
+        row_bytes = self.header["n_columns"] * np.dtype(self.header["dtype"]).itemsize
+        self._file.truncate(HEADER_SIZE + self.n_samples * row_bytes)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_recording(path):
+    """
+    Memory-maps the recording in `path` (read-only) and returns the header dictionary and the
+    (n_samples, n_columns) array of samples. Samples are only read from disk when accessed.
+    """
+    header = read_header(path)
+    shape = (header["n_samples"], header["n_columns"])
+    if header["n_samples"] == 0 or os.path.getsize(path) <= HEADER_SIZE:
+        return header, np.zeros(shape, dtype=header["dtype"])
+    data = np.memmap(path, dtype=header["dtype"], mode="r", offset=HEADER_SIZE, shape=shape)
+    return header, data
@@ -0,0 +1,237 @@
+"""
+Local BITalino simulator for load testing without hardware.
+
+Speaks the BITalino (R)evolution protocol over TCP (use ``"127.0.0.1:<port>"`` as the address
+in ``BITalino``) or over a pseudo-terminal (use the printed ``/dev/pts/N`` path, GNU/Linux and
+Mac OS X only). It answers ``version``, ``state``, ``battery``, ``trigger``, ``pwm`` and
+``start``/``stop``, and while acquiring it streams CRC-ed frames at the requested sampling rate,
+optionally corrupting or dropping a fraction of them.
+
+Example::
+
+    python -m Task2.simulator --port 8001 --corrupt 0.001 --drop 0.001
+"""
+
+import argparse
+import math
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+
+from Task2.bitalino import crc4
+
+VERSION = "BITalino_v5.2\n"
+SAMPLING_RATES = [1, 10, 100, 1000]
+
+
+def frame_size(n_channels):
+    """
+    Number of bytes of a frame with `n_channels` analog channels (as computed in ``BITalino.read``).
+    """
+    if n_channels <= 4:
+        return int(math.ceil((12.0 + 10.0 * n_channels) / 8.0))
+    return int(math.ceil((52.0 + 6.0 * (n_channels - 4)) / 8.0))
+
+
+def encode_frames(sequence, digital, analog):
+    """
+    Packs samples into BITalino frames, the inverse of the decoding in ``BITalino.read``.
+
+    `sequence` has one 4-bit sequence number per sample, `digital` the (n, 4) digital channels
+    (I1 I2 O1 O2) and `analog` the (n, n_channels) analog values (10 bits for the first 4 channels,
+    6 bits for the 5th and 6th). Returns a (n, frame_size) uint8 array with the CRC filled in.
+    """
+    sequence = np.asarray(sequence, dtype=np.int64)
+    digital = np.asarray(digital, dtype=np.int64)
+    analog = np.asarray(analog, dtype=np.int64)
+    n, n_channels = analog.shape
+    padded = np.zeros((n, 6), dtype=np.int64)
+    padded[:, :n_channels] = analog
+    a = padded.T
+
+    frames = np.zeros((n, max(frame_size(n_channels), 8)), dtype=np.int64)
+    frames[:, -1] = (sequence & 0x0F) << 4
+    frames[:, -2] = (digital[:, 0] << 7) | (digital[:, 1] << 6) | (digital[:, 2] << 5) | (digital[:, 3] << 4) | ((a[0] >> 6) & 0x0F)
+    frames[:, -3] = ((a[0] & 0x3F) << 2) | ((a[1] >> 8) & 0x03)
+    frames[:, -4] = a[1] & 0xFF
+    frames[:, -5] = (a[2] >> 2) & 0xFF
+    frames[:, -6] = ((a[2] & 0x03) << 6) | ((a[3] >> 4) & 0x3F)
+    frames[:, -7] = ((a[3] & 0x0F) << 4) | ((a[4] >> 2) & 0x0F)
+    frames[:, -8] = ((a[4] & 0x03) << 6) | (a[5] & 0x3F)
+    frames = frames[:, -frame_size(n_channels):].astype(np.uint8)
+    frames[:, -1] |= crc4(frames)
+    return frames
+
+
+def encode_state(analog, battery, battery_threshold, digital):
+    """
+    Packs the answer to the ``state`` command of a BITalino 5.2 (17 bytes, see ``BITalino.state``).
+    """
+    data = bytearray(17)
+    for i, value in enumerate(list(analog) + [battery]):
+        data[2 * i] = value & 0xFF
+        data[2 * i + 1] = (value >> 8) & 0xFF
+    data[14] = battery_threshold
+    data[16] = (digital[0] << 7) | (digital[1] << 6) | (digital[2] << 5) | (digital[3] << 4)
+    data[16] |= int(crc4(np.frombuffer(bytes(data), dtype=np.uint8)[None])[0])
+    return bytes(data)
+
+
+class Simulator(object):
+    """
+    State machine of one simulated device connected through `recv` and `send` callables.
+
+    `corrupt` and `drop` are the probabilities of flipping one bit of a frame (after its CRC is
+    computed) and of not sending a frame at all (its sequence number is still consumed). With
+    `realtime` off the frames are sent as fast as the client reads them, for throughput tests.
+    """
+
+    def __init__(self, recv, send, corrupt=0.0, drop=0.0, seed=None, realtime=True):
+        self.recv = recv
+        self.send = send
+        self.corrupt = corrupt
+        self.drop = drop
+        self.realtime = realtime
+        self.rng = np.random.default_rng(seed)
+        self.sampling_rate = 1000
+        self.battery_threshold = 0
+        self.digital_outputs = [0, 0]
+        self.pwm = 0
+        self._stream = None
+        self._streaming = threading.Event()
+
+    def run(self):
+        """
+        Handles commands until the connection is closed.
+        """
+        try:
+            while True:
+                command = self.recv(1)
+                if not command:
+                    break
+                self.handle(command[0])
+        except OSError:
+            pass                                            # Client disconnected
+        finally:
+            self.stop()
+
+    def handle(self, command):
+        acquiring = self._streaming.is_set()
+        if command == 255:
+            self.stop()
+        elif command == 7 and not acquiring:
+            self.send(VERSION.encode("utf-8"))
+        elif command == 11 and not acquiring:
+            analog = [int(512 + 100 * np.sin(i)) for i in range(6)]
+            self.send(encode_state(analog, 800, self.battery_threshold, [0, 0] + self.digital_outputs))
+        elif command == 163:
+            self.pwm = self.recv(1)[0]
+        elif command & 0xF3 == 0xB3:
+            self.digital_outputs = [(command >> 2) & 0x01, (command >> 3) & 0x01]
+        elif command & 0x03 == 0x00:
+            if acquiring:
+                self.stop()
+            else:
+                self.battery_threshold = command >> 2
+        elif command & 0x3F == 0x03 and not acquiring:
+            self.sampling_rate = SAMPLING_RATES[command >> 6]
+        elif command & 0x03 in (0x01, 0x02) and not acquiring:
+            channels = [i for i in range(6) if command & (1 << (2 + i))]
+            self.start(channels)
+
+    def start(self, channels):
+        self._streaming.set()
+        self._stream = threading.Thread(target=self._stream_loop, args=(channels,))
+        self._stream.daemon = True
+        self._stream.start()
+
+    def stop(self):
+        self._streaming.clear()
+        if self._stream is not None and self._stream is not threading.current_thread():
+            self._stream.join()
+        self._stream = None
+
+    def _stream_loop(self, channels):
+        rate = self.sampling_rate
+        block = max(1, rate // 100) if self.realtime else 1024     # ~10 ms of frames per write
+        amplitude = np.array([500 if i < 4 else 30 for i in range(len(channels))])
+        center = np.array([512 if i < 4 else 32 for i in range(len(channels))])
+        frequency = 1.0 + np.arange(len(channels))
+        sample = 0
+        start = time.monotonic()
+        try:
+            while self._streaming.is_set():
+                index = sample + np.arange(block)
+                t = index[:, None] / float(rate)
+                analog = center + amplitude * np.sin(2 * np.pi * frequency * t)
+                digital = np.zeros((block, 4), dtype=np.int64)
+                digital[:, 2:] = self.digital_outputs
+                frames = encode_frames(index & 0x0F, digital, analog.astype(np.int64))
+                if self.corrupt > 0:
+                    hit = np.flatnonzero(self.rng.random(block) < self.corrupt)
+                    bits = self.rng.integers(0, 8 * frames.shape[1], len(hit))
+                    frames[hit, bits // 8] ^= (1 << (bits % 8)).astype(np.uint8)
+                if self.drop > 0:
+                    frames = frames[self.rng.random(block) >= self.drop]
+                self.send(frames.tobytes())
+                sample += block
+                delay = start + sample / float(rate) - time.monotonic()
+                if self.realtime and delay > 0:
+                    time.sleep(delay)
+        except OSError:
+            self._streaming.clear()                         # Client disconnected
+
+
+def serve_tcp(host="127.0.0.1", port=8001, **options):
+    """
+    Accepts one client at a time on `host`:`port` and simulates a device for it.
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen(1)
+    print("BITalino simulator listening on %s:%d" % (host, port), flush=True)
+    while True:
+        connection, address = server.accept()
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        Simulator(connection.recv, connection.sendall, **options).run()
+        connection.close()
+
+
+def serve_pty(**options):
+    """
+    Simulates a device behind a pseudo-terminal; connect to the printed serial port.
+    """
+    import tty
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    print("BITalino simulator serial port: %s" % os.ttyname(slave), flush=True)
+
+    def send(data):
+        view = memoryview(data)
+        while len(view):
+            view = view[os.write(master, view):]
+
+    Simulator(lambda n: os.read(master, n), send, **options).run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BITalino device simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--pty", action="store_true", help="serve on a pseudo-terminal instead of TCP")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="probability of corrupting a frame")
+    parser.add_argument("--drop", type=float, default=0.0, help="probability of dropping a frame")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--flood", action="store_true", help="send frames as fast as possible instead of at the sampling rate")
+    args = parser.parse_args()
+
+    options = dict(corrupt=args.corrupt, drop=args.drop, seed=args.seed, realtime=not args.flood)
+    if args.pty:
+        serve_pty(**options)
+    else:
+        serve_tcp(args.host, args.port, **options)
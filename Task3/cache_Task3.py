@@ -0,0 +1,113 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+"""
+Cache em disco dos sinais de impedância por trial
+
+Each entry is a .npz with the raw impedance signal of every RoI of one trial. The key hashes
+the frame file list (path, mtime and size of every file) and the RoI coordinates, so any
+change to the frames or to the RoIs produces a new key and stale entries are never read.
+Large single arrays (the reconstruction matrices of reconstruct_Task3) are kept as .npy and
+memory-mapped on load. Entries are evicted least-recently-used first (a hit refreshes the
+file mtime) when the cache grows beyond max_bytes.
+
+"""
+
+CACHE_DIR = os.environ.get("ICSTS_CACHE_DIR", str(Path.home() / ".cache" / "icsts_eit"))
+MAX_BYTES = 512 * 1024 * 1024
+
+# Incrementar quando o cálculo dos sinais mudar, para invalidar as entradas antigas
+CACHE_VERSION = 1
+
+
+def trial_key(images_file, rs):
+
+    h = hashlib.sha1(("v%d" % CACHE_VERSION).encode())
+    h.update(repr([tuple(int(v) for v in r) for r in rs]).encode())
+
+    for image in images_file:
+        st = os.stat(image)
+        h.update(("%s|%d|%d\n" % (os.path.abspath(image), st.st_mtime_ns, st.st_size)).encode())
+
+    return h.hexdigest()
+
+
+def load_signals(key, cache_dir=None):
+
+    path = Path(cache_dir or CACHE_DIR) / (key + ".npz")
+
+    try:
+        with np.load(path) as data:
+            signals = [data["signal_%d" % i] for i in range(len(data.files))]
+        os.utime(path)  # LRU: marcar como usado recentemente
+    except (OSError, KeyError, ValueError):
+        return None
+
+    return signals
+
+
+def store_signals(key, signals, cache_dir=None, max_bytes=MAX_BYTES):
+
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # Escrita atómica: vários processos podem preencher a cache ao mesmo tempo
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.savez(f, **{"signal_%d" % i: np.asarray(signal, dtype=float) for i, signal in enumerate(signals)})
+    os.replace(tmp, cache_dir / (key + ".npz"))
+
+    evict(cache_dir, max_bytes)
+
+
+def load_array(key, cache_dir=None):
+
+    path = Path(cache_dir or CACHE_DIR) / (key + ".npy")
+
+    try:
+        array = np.load(path, mmap_mode="r")
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+
+    return array
+
+
+def store_array(key, array, cache_dir=None, max_bytes=MAX_BYTES):
+
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, np.asarray(array))
+    os.replace(tmp, cache_dir / (key + ".npy"))
+
+    evict(cache_dir, max_bytes)
+
+
+def evict(cache_dir=None, max_bytes=MAX_BYTES):
+
+    entries = []
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    for path in [*cache_dir.glob("*.npz"), *cache_dir.glob("*.npy")]:
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        total -= size
@@ -0,0 +1,148 @@
+import json
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+
+"""
+Localização dos sets, trials e frames de EIT
+
+The images live under <root>/set_XX/trial_YY/frame_ZZZ.png (as written by image_reconstruct.m).
+The root is taken from the ICSTS_DATA_ROOT environment variable (or given explicitly), and the
+directories are scanned once per set; later lookups are served from the index.
+
+A metadata.json in a trial (or set) directory may give the frame rate, either directly as
+{"fps": 33} or as the recording length in seconds, {"duration": 60.5}, from which the frame
+rate is the number of frames over the duration. image_reconstruct.m writes {"fps": frameRate}
+next to the frames it renders; without a metadata.json, FPS is assumed.
+
+"""
+
+DATA_ROOT = os.environ.get("ICSTS_DATA_ROOT", "C:/Users/anama/OneDrive/Ambiente de Trabalho/UNI/Semestre2/ICSTS/Task3/ICSTS_EIT_Processment/Images")
+
+# Frames por segundo das reconstruções quando não há metadata.json
+FPS = 33
+
+# Coordenadas (x, y, largura, altura) das RoIs obtidas com cv2.selectROI
+R_LEFT = (220, 169, 194, 339)
+R_RIGHT = (498, 169, 194, 339)
+
+_SET = re.compile(r"^set_(\d+)$")
+_TRIAL = re.compile(r"^trial_(\d+)$")
+
+
+def _numbered_dirs(path, pattern):
+
+    dirs = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            match = pattern.match(entry.name)
+            if match and entry.is_dir():
+                dirs[int(match.group(1))] = Path(entry.path)
+
+    return dirs
+
+
+class Dataset:
+
+    def __init__(self, root=None, extension=".png"):
+
+        self.root = Path(root or DATA_ROOT)
+        self.extension = extension
+        self._sets = None
+        self._trials = {}
+
+    def sets(self):
+
+        if self._sets is None:
+            self._sets = _numbered_dirs(self.root, _SET)
+
+        return sorted(self._sets)
+
+    def set_path(self, set):
+
+        self.sets()
+        if set not in self._sets:
+            raise FileNotFoundError("set %d not found in %s" % (set, self.root))
+
+        return self._sets[set]
+
+    def _index_set(self, set):
+
+        # Um único varrimento por set: trials e respetivos frames ordenados
+        if set not in self._trials:
+            index = {}
+            for trial, path in _numbered_dirs(self.set_path(set), _TRIAL).items():
+                with os.scandir(path) as entries:
+                    index[trial] = (path, sorted(entry.path for entry in entries if entry.name.endswith(self.extension)))
+            self._trials[set] = index
+
+        return self._trials[set]
+
+    def trials(self, set):
+
+        return sorted(self._index_set(set))
+
+    def trial_path(self, set, trial):
+
+        return self._index_set(set)[trial][0]
+
+    def frames(self, set, trial):
+
+        return self._index_set(set)[trial][1]
+
+    def fps(self, set, trial, default=FPS):
+
+        for path in (self.trial_path(set, trial), self.set_path(set)):
+            try:
+                with open(path / "metadata.json") as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if "fps" in metadata:
+                return metadata["fps"]
+            if "duration" in metadata:
+                return len(self.frames(set, trial)) / metadata["duration"]
+
+        return default
+
+    def refresh(self):
+
+        self._sets = None
+        self._trials = {}
+
+
+def parse_sets(text):
+
+    # "1-78", "1,4,10-12"
+    sets = []
+    for part in text.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            sets.extend(range(int(first), int(last) + 1))
+        else:
+            sets.append(int(part))
+
+    return sets
+
+
+def write_table(table, output):
+
+    # Parquet (requer pyarrow ou fastparquet), ou CSV se não estiverem instalados; devolve o ficheiro escrito
+    if not output.endswith(".csv"):
+        try:
+            table.to_parquet(output, index=False)
+            return output
+        except ImportError:
+            output = output.rsplit(".", 1)[0] + ".csv"
+
+    table.to_csv(output, index=False)
+
+    return output
+
+
+@lru_cache(maxsize=None)
+def get_dataset(root=None):
+
+    # Uma instância (e um índice) por raiz e por processo
+    return Dataset(root)
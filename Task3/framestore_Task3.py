@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from Task3.dataset_Task3 import get_dataset, parse_sets, R_LEFT, R_RIGHT
+from Task3.functions_Task3 import frames_stream
+
+"""
+Formato compacto dos frames de um trial
+
+pack_trial converts the PNG frames of a trial directory into one .npy file (memory-mappable
+with np.load(mmap_mode="r")) next to them, plus a small JSON index:
+
+* mode "v":    (n_frames, height, width) uint8, the HSV V plane (max of R, G, B) of each frame
+* mode "rois": (n_frames, pixels) uint8, the V plane of the given RoIs only, each one flattened
+               and concatenated (the index keeps their coordinates and offsets)
+
+The index also keeps the mtime and size of every frame (as trial_key of cache_Task3), so a
+packed trial is only used while its PNG frames are unchanged (or after they were deleted).
+Reading a packed trial touches one file and decodes nothing.
+
+trial_rectangle_signals reads a trial once (packed V planes if available, otherwise the PNG
+frames) and computes, for each block of frames, the integral image (summed-area table) of the V
+plane; the mean intensity of any rectangle is then four lookups, so many RoIs cost about the
+same as one. It backs the rectangles stage of pipeline_Task3. Example::
+
+    python -m Task3.framestore_Task3 --sets 1-78 --mode v
+
+"""
+
+PACKED_FILE = "packed_frames.npy"
+INDEX_FILE = "packed_frames.json"
+
+
+def _v_plane(image):
+
+    return np.max(np.array(Image.open(image))[..., :3], axis=-1)
+
+
+def _frame_stats(images_file):
+
+    return [[st.st_mtime_ns, st.st_size] for st in map(os.stat, images_file)]
+
+
+def pack_trial(trial_dir, images_file=None, mode="v", rs=(R_LEFT, R_RIGHT)):
+
+    trial_dir = Path(trial_dir)
+    if images_file is None:
+        images_file = sorted(str(path) for path in trial_dir.glob("*.png"))
+
+    height, width = _v_plane(images_file[0]).shape
+    rs = [tuple(int(v) for v in r) for r in rs]
+
+    if mode == "v":
+        shape = (len(images_file), height, width)
+    elif mode == "rois":
+        shape = (len(images_file), sum(r[2] * r[3] for r in rs))
+    else:
+        raise ValueError("mode must be 'v' or 'rois'")
+
+    # Escrita frame a frame diretamente no ficheiro (memória constante)
+    tmp = trial_dir / (PACKED_FILE + ".tmp")
+    packed = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.uint8, shape=shape)
+    for i, image in enumerate(images_file):
+        v = _v_plane(image)
+        if mode == "v":
+            packed[i] = v
+        else:
+            packed[i] = np.concatenate([v[r[1]:r[1]+r[3], r[0]:r[0]+r[2]].ravel() for r in rs])
+    packed.flush()
+    del packed
+    tmp.replace(trial_dir / PACKED_FILE)
+
+    index = {
+        "mode": mode,
+        "frames": [Path(image).name for image in images_file],
+        "stats": _frame_stats(images_file),
+        "image_shape": [height, width],
+        "rois": rs if mode == "rois" else None,
+    }
+    with open(trial_dir / INDEX_FILE, "w") as f:
+        json.dump(index, f)
+
+    return index
+
+
+def open_trial(trial_dir, images_file=None):
+
+    # Devolve (índice, array memory-mapped) se o trial tiver um ficheiro compacto atualizado, senão None
+    trial_dir = Path(trial_dir)
+
+    try:
+        with open(trial_dir / INDEX_FILE) as f:
+            index = json.load(f)
+        packed = np.load(trial_dir / PACKED_FILE, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+    # Os PNG podem ter sido apagados depois de compactados; se existirem, têm de ser os mesmos frames,
+    # com o mesmo mtime e tamanho
+    if images_file:
+        if [Path(image).name for image in images_file] != index["frames"]:
+            return None
+        try:
+            if _frame_stats(images_file) != index.get("stats"):
+                return None
+        except OSError:
+            return None
+
+    return index, packed
+
+
+def packed_impedance(trial_dir, rs, images_file=None, chunk_size=64):
+
+    opened = open_trial(trial_dir, images_file)
+    if opened is None:
+        return None
+    index, packed = opened
+
+    rs = [tuple(int(v) for v in r) for r in rs]
+    signals = []
+
+    for r in rs:
+        if index["mode"] == "v":
+            crop = packed[:, r[1]:r[1]+r[3], r[0]:r[0]+r[2]]
+            axes = (1, 2)
+        else:
+            stored = [tuple(s) for s in index["rois"]]
+            if r not in stored:
+                return None
+            offset = sum(s[2] * s[3] for s in stored[:stored.index(r)])
+            crop = packed[:, offset:offset + r[2] * r[3]]
+            axes = 1
+
+        signal = np.zeros(len(packed))
+        for start in range(0, len(packed), chunk_size):
+            signal[start:start+chunk_size] = crop[start:start+chunk_size].mean(axis=axes)
+        signals.append(list(signal))
+
+    return signals
+
+
+def integral_images(v):
+
+    # (frames, altura, largura) -> (frames, altura+1, largura+1), com uma linha e coluna de zeros;
+    # int32 chega enquanto 255 * altura * largura não transbordar
+    n, h, w = v.shape
+    dtype = np.int32 if 255 * h * w < 2 ** 31 else np.int64
+    S = np.zeros((n, h + 1, w + 1), dtype=dtype)
+    S[:, 1:, 1:] = v.cumsum(axis=1, dtype=dtype).cumsum(axis=2)
+
+    return S
+
+
+def rectangle_means(S, rects):
+
+    # Média de cada retângulo (x, y, largura, altura) em cada frame: (frames, retângulos). Os retângulos
+    # que saem da imagem são cortados, como no recorte de apply_RoIs
+    h, w = S.shape[1] - 1, S.shape[2] - 1
+    rects = np.asarray(rects)
+    x0, y0 = np.clip(rects[:, 0], 0, w), np.clip(rects[:, 1], 0, h)
+    x1, y1 = np.clip(rects[:, 0] + rects[:, 2], 0, w), np.clip(rects[:, 1] + rects[:, 3], 0, h)
+
+    total = S[:, y1, x1] - S[:, y0, x1] - S[:, y1, x0] + S[:, y0, x0]
+
+    return total / ((x1 - x0) * (y1 - y0))
+
+
+def _v_chunks(trial_dir, images_file, chunk_size, region):
+
+    # Planos V (máximo de R, G e B) da região (x0, y0, x1, y1), em blocos de chunk_size frames
+    x0, y0, x1, y1 = region
+
+    opened = open_trial(trial_dir, images_file)
+    if opened is not None and opened[0]["mode"] == "v":
+        packed = opened[1]
+        for start in range(0, len(packed), chunk_size):
+            yield np.asarray(packed[start:start+chunk_size, y0:y1, x0:x1])
+        return
+
+    chunk = []
+    for frame in frames_stream(images_file):
+        chunk.append(np.max(frame[y0:y1, x0:x1, :3], axis=-1))
+        if len(chunk) == chunk_size:
+            yield np.stack(chunk)
+            chunk = []
+    if chunk:
+        yield np.stack(chunk)
+
+
+def trial_rectangle_signals(trial_dir, images_file, rects, chunk_size=32):
+
+    # Sinal de intensidade de cada retângulo: (retângulos, frames). A imagem integral só cobre a
+    # região que contém todos os retângulos
+    rects = np.asarray(rects)
+    x0, y0 = max(rects[:, 0].min(), 0), max(rects[:, 1].min(), 0)
+    x1, y1 = (rects[:, 0] + rects[:, 2]).max(), (rects[:, 1] + rects[:, 3]).max()
+    shifted = rects - [x0, y0, 0, 0]
+
+    signals = [rectangle_means(integral_images(v), shifted) for v in _v_chunks(trial_dir, images_file, chunk_size, (x0, y0, x1, y1))]
+    if not signals:
+        return None
+
+    return np.concatenate(signals).T
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compactar os frames PNG de cada trial")
+    parser.add_argument("--sets", default=None, help="ex. 1-78 ou 1,3,5-9 (por omissão todos)")
+    parser.add_argument("--root", default=None, help="pasta com os sets (por omissão ICSTS_DATA_ROOT)")
+    parser.add_argument("--mode", choices=["v", "rois"], default="v")
+    args = parser.parse_args()
+
+    dataset = get_dataset(args.root)
+    sets = dataset.sets()
+    if args.sets:
+        sets = [s for s in parse_sets(args.sets) if s in sets]
+
+    for set in sets:
+        for trial in dataset.trials(set):
+            index = pack_trial(dataset.trial_path(set, trial), dataset.frames(set, trial), args.mode)
+            print("set %d trial %d: %d frames" % (set, trial, len(index["frames"])))
@@ -1,41 +1,109 @@
 import scipy
 from PIL import Image
 import numpy as np
+from collections import deque
 from scipy.ndimage import gaussian_filter1d
-import cv2
 
 def apply_RoI(image,r):
     
-    image = Image.open(image)
-    image_np = np.array(image)
-    image= image_np[int(r[1]):int(r[1]+r[3]),int(r[0]):int(r[0]+r[2])] 
+    image=apply_RoIs(image,[r])[0]
     
     return image
 
-def impedance_calc(image_array):
+def apply_RoIs(image,rs):
+
+    # Descodificar a imagem uma única vez para todas as RoIs
+    image = Image.open(image)
+    image_np = np.array(image)
+    images=[image_np[int(r[1]):int(r[1]+r[3]),int(r[0]):int(r[0]+r[2])] for r in rs]
+
+    return images
+
+def intensity_calc(image):
 
-    impedance_means = []
+    # O canal V do HSV é o máximo de B, G e R de cada pixel
+    intensity = np.max(image[..., :3], axis=-1)
 
-    for image in image_array:
+    mean_intensity = np.mean(intensity)
 
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        intensity = hsv[:, :, 2] 
+    return mean_intensity
 
-        mean_intensity = np.mean(intensity)
-        impedance_means.append(mean_intensity)
+def impedance_calc(image_array, chunk_size=64):
+
+    image_array = np.asarray(image_array)
+    impedance_means = np.zeros(len(image_array))
+
+    # Redução vetorizada (máximo nos canais, média nos pixels) em blocos de frames, sem imagens HSV intermédias
+    for start in range(0, len(image_array), chunk_size):
+        chunk = image_array[start:start+chunk_size, ..., :3]
+        impedance_means[start:start+chunk_size] = chunk.max(axis=-1).mean(axis=(1, 2))
     
-    return impedance_means
+    return list(impedance_means)
+
+# Pipeline em streaming: disco -> RoIs -> intensidade V, um frame de cada vez (memória constante)
+
+def frames_stream(images_file):
+
+    for image in images_file:
+        yield np.array(Image.open(image))
+
+def RoIs_stream(frames, rs):
+
+    for frame in frames:
+        yield [frame[int(r[1]):int(r[1]+r[3]),int(r[0]):int(r[0]+r[2])] for r in rs]
+
+def intensity_stream(crops_stream):
+
+    for crops in crops_stream:
+        yield [intensity_calc(crop) for crop in crops]
+
+def impedance_signals(images_file, rs):
+
+    signals = [[] for r in rs]
+
+    for means in intensity_stream(RoIs_stream(frames_stream(images_file), rs)):
+        for signal, mean in zip(signals, means):
+            signal.append(mean)
+
+    return signals
+
+def resample_signal(signal, fps=33, decimation=None):
+
+    # decimation=None: média por segundo (fps frames), como originalmente; caso contrário reamostragem
+    # polifásica para fps/decimation amostras por segundo, sem descartar as últimas amostras (padtype="line":
+    # o padding por omissão é zero, e com sinais à volta de 100-200 as pontas oscilariam e criariam picos falsos).
+    # Devolve o sinal e o número de amostras por segundo
+    signal = np.asarray(signal, dtype=float)
+
+    if decimation is None:
+        fps = int(round(fps))
+        num_seconds = len(signal) // fps
+        return signal[:num_seconds * fps].reshape(num_seconds, fps).mean(axis=1), 1
+
+    return scipy.signal.resample_poly(signal, 1, decimation, padtype="line"), fps / decimation
+
+def normalize(signal_freq):
 
-def processing(signal):
+    return (signal_freq - np.mean(signal_freq)) / np.std(signal_freq)
+
+def smoothing_radius(sigma, rate=1):
+
+    # Meio suporte do filtro de gaussian_filter1d (truncate=4), em amostras
+    return int(4.0 * sigma * rate + 0.5)
+
+def smooth(signal, sigma=2, rate=1, axis=-1):
+
+    # sigma em segundos, rate em amostras por segundo
+    return gaussian_filter1d(signal, sigma=sigma * rate, axis=axis)
+
+def processing(signal, fps=33, decimation=None, sigma=2):
     
-    signal = np.array(signal)
-    fps = 33
-    num_seconds = len(signal) // fps
-    signal_freq = signal[:num_seconds * fps].reshape(num_seconds, fps).mean(axis=1)
+    # sigma em segundos (2 segundos = 2 amostras com a média por segundo)
+    signal_freq, rate = resample_signal(signal, fps, decimation)
 
-    normalized_signal = (signal_freq - np.mean(signal_freq)) / np.std(signal_freq)
+    normalized_signal = normalize(signal_freq)
 
-    smoothed_signal = gaussian_filter1d(normalized_signal, sigma=2)
+    smoothed_signal = smooth(normalized_signal, sigma, rate)
 
     processed_signal=smoothed_signal
 
@@ -51,3 +119,237 @@ def peak_detection(signal,type):
         print("Error: Inserted Type does not exist")
 
     return peak_time
+
+# Processamento de vários sinais de uma vez (todos os trials e pulmões de um set): cada linha de uma
+# matriz com padding é um sinal, lengths indica o número de amostras válidas de cada linha
+
+def processing_batch(signals, fps=33, decimation=None, sigma=2):
+
+    # fps pode ser um valor por sinal
+    fps = np.broadcast_to(fps, len(signals))
+    resampled = [resample_signal(signal, f, decimation) for signal, f in zip(signals, fps)]
+
+    return smoothing_batch(resampled, sigma)
+
+def smoothing_batch(resampled, sigma=2):
+
+    # resampled: [(sinal, amostras por segundo)] como devolvido por resample_signal
+    rates = np.array([rate for _, rate in resampled])
+    lengths = np.array([len(signal_freq) for signal_freq, _ in resampled])
+    n_samples = max(lengths.max(initial=0), 1)
+
+    normalized_signal = np.zeros((len(resampled), n_samples))
+    for row, (signal_freq, _) in enumerate(resampled):
+        normalized_signal[row, :lengths[row]] = normalize(signal_freq)
+
+    # Reflexão de cada linha no seu próprio comprimento (como o modo "reflect" de gaussian_filter1d,
+    # repetido se o sinal for mais curto que o filtro), para o resultado ser igual ao de processing();
+    # um filtro por cada taxa de amostragem diferente
+    smoothed_signal = np.zeros_like(normalized_signal)
+    period = 2 * np.maximum(lengths, 1)[:, None]
+
+    for rate in np.unique(rates):
+        rows = np.flatnonzero(rates == rate)
+        radius = smoothing_radius(sigma, rate)
+        index = np.arange(-radius, n_samples + radius)[None, :] % period[rows]
+        index = np.where(index < period[rows] // 2, index, period[rows] - 1 - index)
+        padded = np.take_along_axis(normalized_signal[rows], index, axis=1)
+        smoothed_signal[rows] = smooth(padded, sigma, rate, axis=1)[:, radius:radius + n_samples]
+
+    mask = np.arange(n_samples) < lengths[:, None]
+    processed_signal = np.where(mask, smoothed_signal, 0)
+
+    return processed_signal, lengths
+
+def peak_detection_batch(signals, lengths, type):
+
+    # Máscara (sinais x segundos) com os picos de cada linha, iguais aos de peak_detection
+    if type == "expiration":
+        x = signals
+    elif type == "inspiration":
+        x = -signals
+    else:
+        raise ValueError("type must be 'expiration' or 'inspiration'")
+
+    valid = np.arange(signals.shape[1]) < lengths[:, None]
+    peaks = np.zeros(signals.shape, dtype=bool)
+    peaks[:, 1:-1] = (x[:, 1:-1] > x[:, :-2]) & (x[:, 1:-1] > x[:, 2:]) & valid[:, 2:]
+
+    # Linhas com patamares (valores consecutivos iguais): find_peaks escolhe o meio do patamar
+    plateaus = np.any((x[:, 1:] == x[:, :-1]) & valid[:, 1:], axis=1)
+    for row in np.flatnonzero(plateaus):
+        peaks[row] = False
+        peaks[row, scipy.signal.find_peaks(x[row, :lengths[row]])[0]] = True
+
+    return peaks
+
+# Processamento em tempo real: um frame de cada vez, com custo constante por frame
+
+class _LocalExtrema:
+
+    # Equivalente incremental de scipy.signal.find_peaks (sem parâmetros): um máximo é confirmado no
+    # primeiro valor que desce depois de uma subida (o meio do patamar, se houver)
+
+    def __init__(self, sign):
+
+        self.sign = sign
+        self.previous = None
+        self.rise = None
+        self.values = []
+
+    def push(self, index, value, pair):
+
+        value = self.sign * value
+        peak = None
+
+        if self.previous is not None:
+            if value > self.previous:
+                self.rise = index
+                self.values = [pair]
+            elif value < self.previous:
+                if self.rise is not None:
+                    peak = ((self.rise + index - 1) // 2, self.values[(index - 1 - self.rise) // 2])
+                self.rise = None
+                self.values = []
+            elif self.rise is not None:
+                self.values.append(pair)
+
+        self.previous = value
+
+        return peak
+
+
+class StreamProcessor:
+
+    # Versão online de processing() + peak_detection() + assimetria de diagnose_set, para os dois pulmões.
+    # Os frames são agrupados em segundos (fps frames), a média e a variância dos segundos são atualizadas
+    # com Welford e o filtro gaussiano é aplicado com atraso fixo de radius = int(4*sigma+0.5) segundos
+    # (o mesmo suporte que gaussian_filter1d). Os picos (expiração) e vales (inspiração) do pulmão esquerdo
+    # ficam confirmados radius segundos (mais o patamar, se houver) depois de ocorrerem.
+    # diff_expiration/diff_inspiration usam a normalização conhecida no momento de cada pico; finish()
+    # devolve os valores finais, iguais aos de processing() + peak_detection() sobre o trial completo.
+    # files_num reproduz a divisão da expiração pelo número de trials feita em diagnose_set.
+
+    def __init__(self, fps=33, sigma=2, files_num=None):
+
+        self.fps = fps
+        self.sigma = sigma
+        self.files_num = files_num
+        self.radius = smoothing_radius(sigma)
+
+        x = np.arange(-self.radius, self.radius + 1)
+        kernel = np.exp(-0.5 * (x / sigma) ** 2)
+        self.kernel = kernel / kernel.sum()
+
+        self.frames = 0
+        self.accumulated = np.zeros(2)
+        self.bins = deque(maxlen=2 * self.radius + 1)
+        self.n_bins = 0
+        self.n_smoothed = 0
+
+        # Welford: médias e somas dos quadrados dos desvios dos segundos (esquerdo, direito)
+        self.mean = np.zeros(2)
+        self.m2 = np.zeros(2)
+
+        self.expiration = _LocalExtrema(1)
+        self.inspiration = _LocalExtrema(-1)
+        self.peaks = {"expiration": [], "inspiration": []}
+        self.sums = {"expiration": 0.0, "inspiration": 0.0}
+
+    def push_frame(self, image, rs):
+
+        crops = RoIs_stream([image], rs)
+
+        return self.push(*next(intensity_stream(crops)))
+
+    def push(self, impedance_left, impedance_right):
+
+        # Devolve os picos confirmados por este frame: [(tipo, segundo)]
+        self.accumulated += (impedance_left, impedance_right)
+        self.frames += 1
+
+        if self.frames < self.fps:
+            return []
+
+        value = self.accumulated / self.fps
+        self.frames = 0
+        self.accumulated = np.zeros(2)
+
+        return self._push_bin(value)
+
+    def _push_bin(self, value):
+
+        self.bins.append(value)
+        self.n_bins += 1
+
+        delta = value - self.mean
+        self.mean += delta / self.n_bins
+        self.m2 += delta * (value - self.mean)
+
+        if self.n_bins <= self.radius:
+            return []
+
+        index = self.n_bins - 1 - self.radius
+        if index >= self.radius:
+            smoothed = self.kernel @ np.array(self.bins)
+        else:
+            # Início do sinal: todos os segundos ainda estão no buffer, reflexão como em gaussian_filter1d
+            smoothed = smooth(np.array(self.bins), self.sigma, axis=0)[index]
+
+        return self._push_smoothed(smoothed)
+
+    def _push_smoothed(self, smoothed):
+
+        index = self.n_smoothed
+        self.n_smoothed += 1
+        events = []
+
+        for type, tracker in (("expiration", self.expiration), ("inspiration", self.inspiration)):
+            peak = tracker.push(index, smoothed[0], smoothed)
+            if peak is not None:
+                self.peaks[type].append(peak[1])
+                self.sums[type] += self._asymmetry(peak[1])
+                events.append((type, peak[0]))
+
+        return events
+
+    def _asymmetry(self, pair):
+
+        std = np.sqrt(self.m2 / self.n_bins)
+        if np.any(std == 0):
+            return 0.0
+        normalized = (pair - self.mean) / std
+
+        return abs(normalized[0] - normalized[1])
+
+    def _diffs(self, sums):
+
+        n_expiration = self.files_num if self.files_num is not None else len(self.peaks["expiration"])
+        n_inspiration = len(self.peaks["inspiration"])
+
+        diff_expiration = sums["expiration"] / n_expiration if n_expiration else 0.0
+        diff_inspiration = sums["inspiration"] / n_inspiration if n_inspiration else 0.0
+
+        return diff_expiration, diff_inspiration
+
+    @property
+    def diff_expiration(self):
+
+        return self._diffs(self.sums)[0]
+
+    @property
+    def diff_inspiration(self):
+
+        return self._diffs(self.sums)[1]
+
+    def finish(self):
+
+        # Últimos segundos (reflexão no fim do sinal) e assimetria com a normalização final
+        if self.n_bins > 0:
+            window = smooth(np.array(self.bins), self.sigma, axis=0)
+            for smoothed in window[len(window) - (self.n_bins - self.n_smoothed):]:
+                self._push_smoothed(smoothed)
+
+        sums = {type: sum(self._asymmetry(pair) for pair in pairs) for type, pairs in self.peaks.items()}
+
+        return self._diffs(sums)
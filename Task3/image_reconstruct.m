@@ -48,38 +48,85 @@ opt.square_pixels = 1;
 imdl=mk_GREIT_model(img, 0.25, [], opt);
 imdl.fwd_model.meas_select = msel;
 
-%% Reconstruir Imagens
+%% Exportar medições e modelo para a reconstrução em Python (Task3/reconstruct_Task3.py)
 
-for set=1:9
+exportRoot = "eit_export";
+if ~exist(exportRoot, 'dir')
+    mkdir(exportRoot);
+end
 
-    folderPath = "C:/Users/anama/OneDrive/Ambiente de Trabalho/UNI/Semestre2/ICSTS/Task3/BRACETS Bimodal Repository of Auscultation Coupled with Electrical Impedance Thoracic Signals/BRACETS/Data/0" + int2str(set) + "/EIT";        
+% Medições de todos os 78 sets carregados acima; a reconstrução em Python não precisa dos PNG.
+% Tudo do modelo direto de imdl: a mesma malha de 16 elétrodos com a estimulação, a normalização e o
+% meas_select usados na reconstrução.
+% Jacobiano no modelo homogéneo com os mesmos padrões de estimulação (sem medições nos elétrodos de corrente)
+export_fmdl = imdl.fwd_model;
+img_h = mk_image(export_fmdl, 1);
+J = calc_jacobian(img_h);
+centroids = interp_mesh(export_fmdl);
+volumes = get_elem_volume(export_fmdl);
+lung_a = export_fmdl.mat_idx{2};
+lung_b = export_fmdl.mat_idx{3};
+save(fullfile(exportRoot, 'model.mat'), 'J', 'centroids', 'volumes', 'lung_a', 'lung_b', 'msel');
+
+for set = 1:78
+    disp(set)
+    trials = fieldnames(data.("set" + int2str(set)));
+    output_folder = fullfile(exportRoot, sprintf('set_%02d', set));
+    if ~exist(output_folder, 'dir')
+        mkdir(output_folder);
+    end
+    for trial = 1:length(trials)
+        vv = data.("set" + int2str(set)).("trial" + int2str(trial));
+        save(fullfile(output_folder, sprintf('trial_%02d.mat', trial)), 'vv');
+    end
+end
 
-    files = dir(fullfile(folderPath, '*.eit'));
 
-    disp(set)
-    disp('---------------------------')
-   for trial = 1:length(files)
-        
-        disp(trial)
-        zc_resp=data.("set" + int2str(set)).("trial"+int2str(trial));
-        img= inv_solve(imdl, zc_resp(:,1), zc_resp);
-
-        num_frames = size(get_img_data(img), 2);
-
-        output_folder = sprintf('set_%02d/trial_%02d', set, trial);
-        if ~exist(output_folder, 'dir')
-            mkdir(output_folder);
-        end
+%% Reconstruir Imagens (opcional)
+
+% Render de cada frame para PNG, só necessário para o pipeline de imagens (main_Task3 com RoIs); desligado
+% por omissão porque a exportação acima (todos os 78 sets) já basta para reconstruct_Task3. Com
+% renderFrames = true são renderizados os sets de renderSets (1 a 9, os usados até agora com as RoIs)
+renderFrames = false;
+renderSets = 1:9;
 
-        for i=1:num_frames
-            figure
-            img.calc_colours.ref_level = 0;
-            img.get_img_data.frame_select = i;
-            show_fem(img);
-            filename = fullfile(output_folder, sprintf('frame_%03d.png', i));
-            saveas(gcf, filename);
-            close(gcf) 
+% Frames por segundo das medições (cada coluna de zc_resp é um frame), escrito no metadata.json de cada
+% trial e lido por Dataset.fps em dataset_Task3; alterar se os ficheiros .eit foram adquiridos a outra taxa
+frameRate = 33;
+
+if renderFrames
+    for set=renderSets
+
+        trials = fieldnames(data.("set" + int2str(set)));
+
+        disp(set)
+        disp('---------------------------')
+        for trial = 1:length(trials)
+
+            disp(trial)
+            zc_resp=data.("set" + int2str(set)).("trial"+int2str(trial));
+            img= inv_solve(imdl, zc_resp(:,1), zc_resp);
+
+            num_frames = size(get_img_data(img), 2);
+
+            output_folder = sprintf('set_%02d/trial_%02d', set, trial);
+            if ~exist(output_folder, 'dir')
+                mkdir(output_folder);
+            end
+
+            fid = fopen(fullfile(output_folder, 'metadata.json'), 'w');
+            fprintf(fid, '%s', jsonencode(struct('fps', frameRate)));
+            fclose(fid);
+
+            for i=1:num_frames
+                figure
+                img.calc_colours.ref_level = 0;
+                img.get_img_data.frame_select = i;
+                show_fem(img);
+                filename = fullfile(output_folder, sprintf('frame_%03d.png', i));
+                saveas(gcf, filename);
+                close(gcf)
+            end
         end
     end
 end
-
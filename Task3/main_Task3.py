@@ -4,12 +4,11 @@ Bibliotecas
 """
 
 import numpy as np
-import os
-from glob import glob
 import matplotlib.pyplot as plt
 from pathlib import Path
 import pandas as pd
 import cv2
+from concurrent.futures import ProcessPoolExecutor
 
 
 """
@@ -18,109 +17,222 @@ functions
 """
 
 from Task3.functions_Task3 import *
+from Task3.cache_Task3 import trial_key, load_signals, store_signals
+from Task3.dataset_Task3 import get_dataset, FPS, R_LEFT, R_RIGHT
+from Task3.framestore_Task3 import packed_impedance
+from Task3.reconstruct_Task3 import load_model, reconstruction_matrix, eit_trials, trial_impedance_eit
 
 """
-Definição da RoI
+Cálculo da impedância de um conjunto de frames (executado em paralelo por get_data)
 
 """
 
-def get_data(set):
+def impedance_chunk(images_file, r_left, r_right):
 
-    ## Selecionar manualmente RoI Pulmão Esquerdo
-    #r_left=cv2.selectROI("select the area left", image)
-    #cv2.destroyWindow("select the area left")
+    impedance_left, impedance_right = impedance_signals(images_file, [r_left, r_right])
 
-    ## Selecionar manualmente RoI Pulmão Direito
-    #r_right=cv2.selectROI("select the area right", image)
-    #cv2.destroyWindow("select the area right")
-    
-    path_frame="C:/Users/anama/OneDrive/Ambiente de Trabalho/UNI/Semestre2/ICSTS/Task3/ICSTS_EIT_Processment/Images/set_01/trial_04/frame_027.png"
+    return impedance_left, impedance_right
 
-    # Coordenadas obtidas com zona anterior comentada
-    r_left=220, 169, 194, 339 
-    r_right=498, 169, 194, 339
+"""
+Sinais de impedância de todos os trials de um set
 
+"""
 
-    sample_image_left = apply_RoI(path_frame, r_left)
-    sample_image_right = apply_RoI(path_frame, r_right)
+def set_impedance_signals(set, workers=None, chunk_size=64, cache=True, cache_dir=None, root=None, r_left=R_LEFT, r_right=R_RIGHT, executor=None, verbose=False):
 
-    # Example shape from first image
-    sample_array_left = np.array(sample_image_left)
-    sample_array_right = np.array(sample_image_right)
+    dataset=get_dataset(root)
+    trials=dataset.trials(set)
+    files_num=len(trials)
 
-    height_l, width_l, channels_l = sample_array_left.shape
-    height_r, width_r, channels_r = sample_array_right.shape
+    trials_files=[dataset.frames(set, trial) for trial in trials]
+    impedance_signals_left=[None]*files_num
+    impedance_signals_right=[None]*files_num
 
-    path_set_file="C:/Users/anama/OneDrive/Ambiente de Trabalho/UNI/Semestre2/ICSTS/Task3/ICSTS_EIT_Processment/Images/set_0"+str(set)
+    # Sinais já calculados numa execução anterior
+    keys=[trial_key(images_file, [r_left, r_right]) if cache and images_file else None for images_file in trials_files]
+    cached=[load_signals(key, cache_dir) if key else None for key in keys]
 
-    items = os.listdir(path_set_file)
-    files_num = len([item for item in items if os.path.isdir(os.path.join(path_set_file, item))])
+    # Trials compactados com framestore_Task3: lidos de um único ficheiro, sem descodificar PNG
+    for trial in range(files_num):
+        if cached[trial] is None:
+            cached[trial]=packed_impedance(dataset.trial_path(set, trials[trial]), [r_left, r_right], trials_files[trial])
+            if cached[trial] is not None and keys[trial]:
+                store_signals(keys[trial], cached[trial], cache_dir)
 
-    diff_expiration_trial=np.zeros(files_num)
-    diff_inspiration_trial=np.zeros(files_num)
+    # Dividir cada trial em falta em blocos de frames independentes
+    chunks=[(trial, images_file[i:i+chunk_size]) for trial, images_file in enumerate(trials_files) if cached[trial] is None for i in range(0, len(images_file), chunk_size)]
+    args=([c[1] for c in chunks], [r_left]*len(chunks), [r_right]*len(chunks))
+
+    if executor is not None:
+        results=list(executor.map(impedance_chunk, *args))
+    elif workers is not None and workers > 1 and len(chunks) > 0:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results=list(executor.map(impedance_chunk, *args))
+    else:
+        results=list(map(impedance_chunk, *args))
 
     for trial in range(1,files_num+1):
 
-        print(str(trial))
+        if verbose:
+            print(str(trial))
 
-        if trial > 9:
-            images_file=sorted(glob("C:/Users/anama/OneDrive/Ambiente de Trabalho/UNI/Semestre2/ICSTS/Task3/ICSTS_EIT_Processment/Images/set_0"+str(set)+"/trial_"+str(trial)+'/*.png'))
+        if cached[trial-1] is not None:
+            impedance_signal_left, impedance_signal_right = cached[trial-1]
         else:
-            images_file=sorted(glob("C:/Users/anama/OneDrive/Ambiente de Trabalho/UNI/Semestre2/ICSTS/Task3/ICSTS_EIT_Processment/Images/set_0"+str(set)+"/trial_0"+str(trial)+'/*.png'))
+            # Juntar os blocos do trial pela ordem original
+            trial_results=[result for chunk, result in zip(chunks, results) if chunk[0] == trial-1]
+            impedance_signal_left=[value for result in trial_results for value in result[0]]
+            impedance_signal_right=[value for result in trial_results for value in result[1]]
+
+            if keys[trial-1]:
+                store_signals(keys[trial-1], [impedance_signal_left, impedance_signal_right], cache_dir)
+
+        impedance_signals_left[trial-1]=impedance_signal_left
+        impedance_signals_right[trial-1]=impedance_signal_right
+
+    return trials, impedance_signals_left, impedance_signals_right
+
+"""
+Definição da RoI
+
+"""
+
+def diagnose_set(set, workers=None, chunk_size=64, cache=True, cache_dir=None, root=None, r_left=R_LEFT, r_right=R_RIGHT, executor=None, fps=None, decimation=None, sigma=2, verbose=False):
+
+    # workers > 1 distribui os trials (e os frames de trials longos, em blocos de chunk_size frames) por um
+    # pool de processos (ou pelo executor dado, partilhado entre sets); o resultado é idêntico ao da execução em série.
+    # Em Windows o script que chama get_data tem de estar protegido por if __name__ == "__main__".
+    # Com cache=True os sinais de impedância de cada trial são guardados em disco (ver cache_Task3) e só
+    # são recalculados quando os frames ou as RoIs mudam.
+    # root é a pasta com os sets (por omissão ICSTS_DATA_ROOT, ver dataset_Task3).
+    # fps=None lê a taxa de frames de cada trial do metadata.json do dataset (por omissão 33); decimation e
+    # sigma (em segundos) são passados a processing (decimation=None mantém a média por segundo).
+
+    ## Selecionar manualmente RoI Pulmão Esquerdo
+    #r_left=cv2.selectROI("select the area left", image)
+    #cv2.destroyWindow("select the area left")
+
+    ## Selecionar manualmente RoI Pulmão Direito
+    #r_right=cv2.selectROI("select the area right", image)
+    #cv2.destroyWindow("select the area right")
+    
+    # Coordenadas obtidas com zona anterior comentada (R_LEFT e R_RIGHT em dataset_Task3)
+
+    trials, impedance_signals_left, impedance_signals_right = set_impedance_signals(set, workers, chunk_size, cache, cache_dir, root, r_left, r_right, executor, verbose)
+    files_num=len(trials)
+    n_frames=[len(signal) for signal in impedance_signals_left]
+
+    if fps is None:
+        dataset=get_dataset(root)
+        fps=[dataset.fps(set, trial) for trial in trials]
+
+    diff_expiration_trial, diff_inspiration_trial = trials_diff(impedance_signals_left, impedance_signals_right, files_num, fps, decimation, sigma)
+
+    return set_diagnosis(set, trials, n_frames, diff_expiration_trial, diff_inspiration_trial)
 
-        image_array_left = np.zeros((len(images_file), height_l, width_l, channels_l), dtype=np.uint8)
+"""
+Assimetria entre pulmões de todos os trials e diagnóstico do set
 
-        image_array_right = np.zeros((len(images_file), height_r, width_r, channels_r), dtype=np.uint8)
+"""
 
-        for image_num in range(len(images_file)):
+def trials_diff(impedance_signals_left, impedance_signals_right, files_num, fps=FPS, decimation=None, sigma=2):
 
-            image_left = apply_RoI(images_file[image_num], r_left)
-            image_right = apply_RoI(images_file[image_num], r_right)
+    # Todos os trials (e os dois pulmões) processados de uma vez numa matriz com padding
+    n_trials=len(impedance_signals_left)
+    fps=np.broadcast_to(fps, n_trials)
+    processed_signals, lengths = processing_batch(list(impedance_signals_left) + list(impedance_signals_right), np.concatenate([fps, fps]), decimation, sigma)
+    processed_signals_left, processed_signals_right = processed_signals[:n_trials], processed_signals[n_trials:]
 
-            image_array_left[image_num]=image_left
-            image_array_right[image_num]=image_right
+    expiration_frames=peak_detection_batch(processed_signals_left, lengths[:n_trials], "expiration")
+    inspiration_frames=peak_detection_batch(processed_signals_left, lengths[:n_trials], "inspiration")
 
-        
-        impedance_signal_left=impedance_calc(image_array_left)
-        impedance_signal_right=impedance_calc(image_array_right)
+    return trials_asymmetry(processed_signals_left, processed_signals_right, expiration_frames, inspiration_frames, files_num)
 
-        processed_signal_left=processing(impedance_signal_left)
-        processed_signal_right=processing(impedance_signal_right)
+def trials_asymmetry(processed_signals_left, processed_signals_right, expiration_frames, inspiration_frames, files_num):
 
-        # Expiration
-        expiration_frames=peak_detection(processed_signal_left,"expiration")
-        sum=0
-        
-        for i in expiration_frames:
-            sum=sum+abs(processed_signal_left[i]-processed_signal_right[i])
+    # Sinais processados e máscaras de picos (trials x amostras), como devolvidos por processing_batch e peak_detection_batch
+    diff=np.abs(processed_signals_left-processed_signals_right)
 
-        
-        diff_expiration_trial[trial-1]=sum/files_num
+    # Expiration
+    diff_expiration_trial=np.sum(diff*expiration_frames, axis=1)/files_num
 
+    # Inspiration
+    n_inspiration=np.sum(inspiration_frames, axis=1)
+    if np.any(n_inspiration == 0):
+        raise ZeroDivisionError("trial without inspiration peaks")
+    diff_inspiration_trial=np.sum(diff*inspiration_frames, axis=1)/n_inspiration
 
-        # Inspiration
-        inspiration_frames=peak_detection(processed_signal_left,"inspiration")
-        sum=0
-        
-        for i in inspiration_frames:
-            sum=sum+abs(processed_signal_left[i]-processed_signal_right[i])
+    return diff_expiration_trial, diff_inspiration_trial
 
+def set_diagnosis(set, trials, n_frames, diff_expiration_trial, diff_inspiration_trial, threshold=0.5):
 
-        diff_inspiration_trial[trial-1]=sum/len(inspiration_frames)
+    files_num=len(trials)
 
     diff_expiration=np.sum(diff_expiration_trial)/files_num
     diff_inspiration=np.sum(diff_inspiration_trial)/files_num
 
 
     
-    if diff_expiration > 0.5 or diff_inspiration > 0.5:
-        print("The patient should be evaluated through other techniques of diagnosis.\n")
+    if diff_expiration > threshold or diff_inspiration > threshold:
         diag=1
     else:
-        print("The patient is healthy\n")
         diag=0
 
-    return diff_expiration, diff_inspiration, diag
+    return {
+        "set": set,
+        "trials": trials,
+        "n_frames": n_frames,
+        "diff_expiration_trial": diff_expiration_trial,
+        "diff_inspiration_trial": diff_inspiration_trial,
+        "diff_expiration": diff_expiration,
+        "diff_inspiration": diff_inspiration,
+        "diag": diag,
+    }
+
+"""
+Diagnóstico a partir da reconstrução em Python (sem imagens PNG, ver reconstruct_Task3)
+
+"""
+
+def diagnose_set_eit(set, eit_root, model=None, RM=None, hyperparameter=0.03, prior="noser", cache=True, cache_dir=None, fps=FPS, decimation=None, sigma=2, verbose=False):
+
+    # eit_root contém model.mat e set_XX/trial_YY.mat exportados pela última secção de image_reconstruct.m.
+    # RM pode ser dado para reutilizar a mesma matriz de reconstrução entre sets; senão é lida da cache
+    # em disco (ou calculada e guardada) com cache=True.
+    if model is None:
+        model=load_model(Path(eit_root) / "model.mat")
+    if RM is None:
+        RM=reconstruction_matrix(model, hyperparameter, prior, cache=cache, cache_dir=cache_dir)
+
+    trials_path=eit_trials(eit_root, set)
+    files_num=len(trials_path)
+    if files_num == 0:
+        raise FileNotFoundError("set %d not found in %s" % (set, eit_root))
+
+    impedance_signals_left=[]
+    impedance_signals_right=[]
+
+    for trial, path in enumerate(trials_path):
+
+        if verbose:
+            print(str(trial+1))
 
+        impedance_signal_left, impedance_signal_right = trial_impedance_eit(path, RM, model)
+        impedance_signals_left.append(impedance_signal_left)
+        impedance_signals_right.append(impedance_signal_right)
 
+    n_frames=[len(signal) for signal in impedance_signals_left]
+    diff_expiration_trial, diff_inspiration_trial = trials_diff(impedance_signals_left, impedance_signals_right, files_num, fps, decimation, sigma)
+
+    return set_diagnosis(set, list(range(1, files_num+1)), n_frames, diff_expiration_trial, diff_inspiration_trial)
+
+def get_data(set, **options):
+
+    result=diagnose_set(set, verbose=True, **options)
+
+    if result["diag"] == 1:
+        print("The patient should be evaluated through other techniques of diagnosis.\n")
+    else:
+        print("The patient is healthy\n")
 
+    return result["diff_expiration"], result["diff_inspiration"], result["diag"]
@@ -0,0 +1,260 @@
+import hashlib
+import itertools
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from Task3.cache_Task3 import trial_key, load_signals, store_signals
+from Task3.dataset_Task3 import get_dataset, R_LEFT, R_RIGHT
+from Task3.framestore_Task3 import trial_rectangle_signals
+from Task3.functions_Task3 import resample_signal, smoothing_batch, peak_detection_batch
+from Task3.main_Task3 import set_impedance_signals, set_diagnosis, trials_asymmetry
+
+"""
+Pipeline de Task3 por etapas com resultados memorizados
+
+The diagnosis of a set is split into named stages, each one computed from the output of the
+previous one and a few parameters of its own:
+
+    load       frame files of every trial              (root)
+    rectangles integral-image means of many RoI pairs  (rois)
+    intensity  RoI crop and V intensity of each frame  (r_left, r_right)
+    binning    1 s means or polyphase resampling       (fps, decimation)
+    smoothing  z-normalisation and Gaussian filter     (sigma)
+    peaks      expiration and inspiration frames       (-)
+    asymmetry  per-trial lung differences              (-)
+    diagnosis  set means and threshold                 (threshold)
+
+Every output is memorised under a key that hashes the stage name, its parameters and the key
+of its input, so changing a parameter only recomputes that stage and the ones after it (a
+sweep over sigma never touches the frames again). Only the max_entries most recently used
+outputs are kept in memory; older ones are recomputed from their inputs if asked for again. The intensity stage goes through
+set_impedance_signals, and therefore through the on-disk cache of cache_Task3 and the packed
+frames of framestore_Task3, so it is also shared with diagnose_set and between runs.
+
+The rectangles stage is only used by sweep when it varies the RoIs (for example over the pairs
+of roi_grid in sweep_Task3): every trial is read once
+and the signals of all the RoI pairs come from integral images (trial_rectangle_signals); they
+are stored in the same on-disk cache, and the intensity stage takes them from there instead of
+reading the frames once per pair. Example::
+
+    pipeline = Pipeline()
+    table = pipeline.sweep(range(1, 79), sigma=[1, 2, 3], threshold=[0.4, 0.5, 0.6])
+    table = pipeline.sweep(range(1, 79), rois=roi_grid([-20, 0, 20]), sigma=[1, 2, 3])
+
+"""
+
+STAGES = ["load", "rectangles", "intensity", "binning", "smoothing", "peaks", "asymmetry", "diagnosis"]
+
+
+def stage_key(stage, upstream, **params):
+
+    h = hashlib.sha1(("%s|%s|" % (stage, upstream)).encode())
+    h.update(repr(sorted(params.items())).encode())
+
+    return stage + ":" + h.hexdigest()
+
+
+class Pipeline:
+
+    def __init__(self, root=None, cache=True, cache_dir=None, workers=None, executor=None, max_entries=256):
+
+        self.root = root
+        self.dataset = get_dataset(root)
+        self.cache = cache
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.executor = executor
+
+        self.max_entries = max_entries
+        self.memo = OrderedDict()
+        self.loaded = {}
+        self.prefetched = None
+        self.computed = Counter()
+
+    def _run(self, stage, upstream, compute, **params):
+
+        key = stage_key(stage, upstream, **params)
+
+        # LRU: o resultado usado passa para o fim e os mais antigos saem quando há mais de max_entries
+        if key in self.memo:
+            self.memo.move_to_end(key)
+        else:
+            self.memo[key] = compute()
+            self.computed[stage] += 1
+            while len(self.memo) > self.max_entries:
+                self.memo.popitem(last=False)
+
+        return key, self.memo[key]
+
+    def clear(self, stage=None):
+
+        # Esquecer os resultados em memória (de uma etapa ou de todas); clear() ou clear("load") voltam
+        # a ler as pastas do dataset
+        if stage is None:
+            self.memo = OrderedDict()
+        else:
+            self.memo = OrderedDict((key, value) for key, value in self.memo.items() if not key.startswith(stage + ":"))
+
+        if stage in (None, "load"):
+            self.loaded = {}
+            self.dataset.refresh()
+
+        if stage in (None, "load", "rectangles"):
+            self.prefetched = None
+
+    def load(self, set):
+
+        # A chave depende dos ficheiros (caminho, mtime e tamanho): frames novos invalidam tudo o que se segue.
+        # Os ficheiros são verificados uma vez por set até clear("load")
+        if set not in self.loaded:
+            trials = self.dataset.trials(set)
+            frames = [self.dataset.frames(set, trial) for trial in trials]
+            upstream = "|".join(trial_key(images_file, []) for images_file in frames)
+            self.loaded[set] = self._run("load", upstream, lambda: (trials, frames), set=set)
+
+        return self.loaded[set]
+
+    def _map(self, function, *args):
+
+        # Como em set_impedance_signals: o executor dado, um pool próprio com workers > 1, ou em série
+        if self.executor is not None:
+            return list(self.executor.map(function, *args))
+        if self.workers is not None and self.workers > 1 and len(args[0]) > 0:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                return list(executor.map(function, *args))
+        return list(map(function, *args))
+
+    def rectangles(self, set, rois):
+
+        upstream, (trials, frames) = self.load(set)
+        rois = sorted({(tuple(int(v) for v in r_left), tuple(int(v) for v in r_right)) for r_left, r_right in rois})
+
+        def compute():
+            # Pares já na cache em disco (de set_impedance_signals ou de um varrimento anterior) não são recalculados
+            keys = [{roi: trial_key(images_file, list(roi)) if self.cache and images_file else None for roi in rois} for images_file in frames]
+            signals = [{roi: load_signals(key, self.cache_dir) for roi, key in trial_keys.items() if key} for trial_keys in keys]
+
+            # Os trials com pares em falta são lidos uma vez, para todos os retângulos desses pares
+            missing = [trial for trial in range(len(trials)) if any(signals[trial].get(roi) is None for roi in rois)]
+            rects = [sorted({r for roi in rois if signals[trial].get(roi) is None for r in roi}) for trial in missing]
+            results = self._map(trial_rectangle_signals, [self.dataset.trial_path(set, trials[trial]) for trial in missing],
+                                [frames[trial] for trial in missing], rects)
+
+            for trial, trial_rects, result in zip(missing, rects, results):
+                means = {r: [] if result is None else result[i] for i, r in enumerate(trial_rects)}
+                for roi in rois:
+                    if signals[trial].get(roi) is None:
+                        signals[trial][roi] = [means[roi[0]], means[roi[1]]]
+                        if keys[trial][roi]:
+                            store_signals(keys[trial][roi], signals[trial][roi], self.cache_dir)
+
+            return {roi: (trials, [s[roi][0] for s in signals], [s[roi][1] for s in signals]) for roi in rois}
+
+        key, result = self._run("rectangles", upstream, compute, rois=rois)
+        self.prefetched = (upstream, result)
+
+        return key, result
+
+    def intensity(self, set, r_left=R_LEFT, r_right=R_RIGHT):
+
+        upstream, _ = self.load(set)
+        r_left, r_right = tuple(int(v) for v in r_left), tuple(int(v) for v in r_right)
+
+        def compute():
+            # Sinais da última chamada a rectangles, se for deste set (com os mesmos ficheiros) e deste par;
+            # são os mesmos valores que set_impedance_signals calcularia
+            if self.prefetched is not None and self.prefetched[0] == upstream and (r_left, r_right) in self.prefetched[1]:
+                return self.prefetched[1][(r_left, r_right)]
+
+            trials, impedance_signals_left, impedance_signals_right = set_impedance_signals(
+                set, self.workers, cache=self.cache, cache_dir=self.cache_dir, root=self.root,
+                r_left=r_left, r_right=r_right, executor=self.executor)
+            return trials, impedance_signals_left, impedance_signals_right
+
+        return self._run("intensity", upstream, compute, r_left=r_left, r_right=r_right)
+
+    def binning(self, set, r_left=R_LEFT, r_right=R_RIGHT, fps=None, decimation=None):
+
+        upstream, (trials, impedance_signals_left, impedance_signals_right) = self.intensity(set, r_left, r_right)
+
+        def compute():
+            trials_fps = [self.dataset.fps(set, trial) if fps is None else fps for trial in trials]
+            left = [resample_signal(signal, f, decimation) for signal, f in zip(impedance_signals_left, trials_fps)]
+            right = [resample_signal(signal, f, decimation) for signal, f in zip(impedance_signals_right, trials_fps)]
+            return left, right
+
+        return self._run("binning", upstream, compute, fps=fps, decimation=decimation)
+
+    def smoothing(self, set, r_left=R_LEFT, r_right=R_RIGHT, fps=None, decimation=None, sigma=2):
+
+        upstream, (left, right) = self.binning(set, r_left, r_right, fps, decimation)
+
+        def compute():
+            # Os dois pulmões numa só matriz, como em trials_diff
+            processed_signals, lengths = smoothing_batch(left + right, sigma)
+            return processed_signals[:len(left)], processed_signals[len(left):], lengths[:len(left)]
+
+        return self._run("smoothing", upstream, compute, sigma=sigma)
+
+    def peaks(self, set, r_left=R_LEFT, r_right=R_RIGHT, fps=None, decimation=None, sigma=2):
+
+        upstream, (left, _, lengths) = self.smoothing(set, r_left, r_right, fps, decimation, sigma)
+
+        def compute():
+            return peak_detection_batch(left, lengths, "expiration"), peak_detection_batch(left, lengths, "inspiration")
+
+        return self._run("peaks", upstream, compute)
+
+    def asymmetry(self, set, r_left=R_LEFT, r_right=R_RIGHT, fps=None, decimation=None, sigma=2):
+
+        upstream, (expiration_frames, inspiration_frames) = self.peaks(set, r_left, r_right, fps, decimation, sigma)
+        _, (left, right, _) = self.smoothing(set, r_left, r_right, fps, decimation, sigma)
+
+        def compute():
+            return trials_asymmetry(left, right, expiration_frames, inspiration_frames, len(left))
+
+        return self._run("asymmetry", upstream, compute)
+
+    def diagnosis(self, set, r_left=R_LEFT, r_right=R_RIGHT, fps=None, decimation=None, sigma=2, threshold=0.5):
+
+        upstream, (diff_expiration_trial, diff_inspiration_trial) = self.asymmetry(set, r_left, r_right, fps, decimation, sigma)
+        _, (trials, impedance_signals_left, _) = self.intensity(set, r_left, r_right)
+
+        def compute():
+            n_frames = [len(signal) for signal in impedance_signals_left]
+            return set_diagnosis(set, trials, n_frames, diff_expiration_trial, diff_inspiration_trial, threshold)
+
+        return self._run("diagnosis", upstream, compute, threshold=threshold)[1]
+
+    def sweep(self, sets, rois=None, **grid):
+
+        # grid: listas de valores dos parâmetros de diagnosis (r_left, r_right, fps, decimation, sigma, threshold);
+        # rois: pares (r_left, r_right), por ex. de roi_grid, em vez do produto das listas r_left e r_right.
+        # Os sets são o ciclo exterior: com mais de um par, a etapa rectangles lê os frames do set uma só vez
+        if rois is None:
+            rois = itertools.product(grid.pop("r_left", [R_LEFT]), grid.pop("r_right", [R_RIGHT]))
+        rois = [(tuple(int(v) for v in r_left), tuple(int(v) for v in r_right)) for r_left, r_right in rois]
+        names = sorted(grid)
+        rows = []
+
+        for set in sets:
+            try:
+                if len(rois) > 1:
+                    self.rectangles(set, rois)
+            except FileNotFoundError as e:
+                print("set %d: %s" % (set, e))
+                continue
+
+            for (r_left, r_right), values in itertools.product(rois, itertools.product(*(grid[name] for name in names))):
+                params = {"r_left": r_left, "r_right": r_right, **dict(zip(names, values))}
+                try:
+                    result = self.diagnosis(set, **params)
+                except (FileNotFoundError, ZeroDivisionError, ValueError) as e:
+                    print("set %d %s: %s" % (set, params, e))
+                    continue
+                rows.append({**params, "set": set, "diff_expiration": result["diff_expiration"],
+                             "diff_inspiration": result["diff_inspiration"], "diag": result["diag"]})
+
+        return pd.DataFrame(rows)
@@ -0,0 +1,145 @@
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import scipy.io
+
+from Task3.cache_Task3 import load_array, store_array
+
+"""
+Reconstrução de EIT em Python (alternativa ao render para PNG do image_reconstruct.m)
+
+The measurements of every trial and the forward model (Jacobian, element centres and volumes,
+lung elements and measurement selection) are exported once by the last section of
+image_reconstruct.m, since the .eit files are read with EIDORS' eidors_readdata:
+
+    <eit_root>/model.mat              J, centroids, volumes, lung_a, lung_b, msel
+    <eit_root>/set_XX/trial_YY.mat    vv (measurements x frames)
+
+A one-step Gauss-Newton reconstruction matrix RM is computed from J, and every frame of a
+trial is reconstructed with a single matrix product RM @ dv, where dv are the normalised
+difference measurements against the reference frame. The lung impedance signals are taken
+directly from the element conductivities, with no rendering.
+
+RM depends only on the model (J, which already holds the stimulation pattern), the measurement
+selection, the prior and the hyperparameter; reconstruction_matrix stores it in the on-disk
+cache of cache_Task3 under a hash of those, so later runs memory-map it instead of solving.
+
+"""
+
+
+def load_model(path):
+
+    model = scipy.io.loadmat(path, squeeze_me=True)
+
+    msel = np.asarray(model["msel"], dtype=bool) if "msel" in model else None
+    centroids = np.atleast_2d(model["centroids"])
+
+    # Índices MATLAB (base 1) -> Python; o pulmão com menor x é o esquerdo da imagem (como r_left)
+    lungs = [np.asarray(model["lung_a"], dtype=int) - 1, np.asarray(model["lung_b"], dtype=int) - 1]
+    lungs.sort(key=lambda elements: centroids[elements, 0].mean())
+
+    return {
+        "J": np.asarray(model["J"], dtype=float),
+        "centroids": centroids,
+        "volumes": np.asarray(model["volumes"], dtype=float),
+        "lung_left": lungs[0],
+        "lung_right": lungs[1],
+        "msel": msel,
+    }
+
+
+def load_measurements(path, msel=None):
+
+    vv = np.asarray(scipy.io.loadmat(path, squeeze_me=True)["vv"], dtype=float)
+
+    if msel is not None and vv.shape[0] == len(msel):
+        vv = vv[msel]
+
+    return vv
+
+
+def gauss_newton_matrix(J, hyperparameter=0.03, prior="noser", exponent=0.5):
+
+    # RM = (J'J + λ²R)^-1 J' com R diagonal, calculado na forma dual R^-1 J' (J R^-1 J' + λ²I)^-1,
+    # que só inverte uma matriz medições x medições (208 x 208) em vez de elementos x elementos
+    if prior == "noser":
+        r = np.sum(J ** 2, axis=0) ** exponent
+    elif prior == "tikhonov":
+        r = np.ones(J.shape[1])
+    else:
+        raise ValueError("prior must be 'noser' or 'tikhonov'")
+
+    JR = J / r
+    A = JR @ J.T + hyperparameter ** 2 * np.eye(J.shape[0])
+    RM = np.linalg.solve(A, JR).T
+
+    return RM
+
+
+def matrix_key(J, msel=None, hyperparameter=0.03, prior="noser", exponent=0.5):
+
+    J = np.ascontiguousarray(J, dtype=float)
+
+    h = hashlib.sha1(b"gauss_newton_matrix")
+    h.update(repr((J.shape, float(hyperparameter), prior, float(exponent))).encode())
+    h.update(J.tobytes())
+    if msel is not None:
+        h.update(np.packbits(np.asarray(msel, dtype=bool)).tobytes())
+
+    return "rm_" + h.hexdigest()
+
+
+def reconstruction_matrix(model, hyperparameter=0.03, prior="noser", exponent=0.5, cache=True, cache_dir=None):
+
+    # Calculada uma vez por (modelo, estimulação, prior, hiperparâmetro); depois lida com mmap
+    if not cache:
+        return gauss_newton_matrix(model["J"], hyperparameter, prior, exponent)
+
+    key = matrix_key(model["J"], model["msel"], hyperparameter, prior, exponent)
+    RM = load_array(key, cache_dir)
+
+    if RM is None:
+        RM = gauss_newton_matrix(model["J"], hyperparameter, prior, exponent)
+        store_array(key, RM, cache_dir)
+
+    return RM
+
+
+def reconstruct(RM, vv, reference=0, normalize=True):
+
+    # Todos os frames de uma vez: (elementos x medições) @ (medições x frames)
+    vh = vv[:, [reference]]
+    dv = vv - vh
+    if normalize:
+        dv = dv / vh
+
+    return RM @ dv
+
+
+def lung_impedance(images, model):
+
+    # Média da variação de condutividade nos elementos de cada pulmão, pesada pelo volume; o sinal
+    # é invertido para acompanhar a impedância (aumenta na inspiração)
+    signals = []
+
+    for lung in (model["lung_left"], model["lung_right"]):
+        weights = model["volumes"][lung] / np.sum(model["volumes"][lung])
+        signals.append(-(weights @ images[lung]))
+
+    return signals
+
+
+def eit_trials(eit_root, set):
+
+    set_dir = Path(eit_root) / ("set_%02d" % set)
+
+    return sorted(set_dir.glob("trial_*.mat"))
+
+
+def trial_impedance_eit(path, RM, model):
+
+    vv = load_measurements(path, model["msel"])
+    impedance_left, impedance_right = lung_impedance(reconstruct(RM, vv), model)
+
+    return impedance_left, impedance_right
@@ -0,0 +1,87 @@
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from Task3.dataset_Task3 import get_dataset, parse_sets, write_table, R_LEFT, R_RIGHT
+from Task3.pipeline_Task3 import Pipeline
+
+"""
+Varrimento de RoIs, sigma e limiar de diagnóstico
+
+The RoI pairs of roi_grid, the sigmas and the thresholds are swept with Pipeline.sweep of
+pipeline_Task3: every trial is read once for all the pairs (its rectangles stage, with the
+integral images of framestore_Task3), the signals go to the on-disk cache, and the diagnosis
+of every set is computed as in diagnose_set, giving one row per configuration and set. The
+trials are distributed over a process pool. Example (negative offsets need the "=" form, or
+argparse reads them as an option)::
+
+    python -m Task3.sweep_Task3 --sets 1-78 --offsets=-20,0,20 --scales 0.9,1,1.1 --sigmas 1,2,3 --thresholds 0.4,0.5,0.6
+
+"""
+
+
+def roi_grid(offsets=(0,), scales=(1.0,), r_left=R_LEFT, r_right=R_RIGHT):
+
+    # Pares de RoIs à volta das RoIs escolhidas à mão: centro deslocado (dx, dy), com dx espelhado na
+    # RoI direita, e largura/altura multiplicadas por scale
+    def moved(r, dx, dy, scale):
+        w, h = int(round(r[2] * scale)), int(round(r[3] * scale))
+        x = int(round(r[0] + r[2] / 2 + dx - w / 2))
+        y = int(round(r[1] + r[3] / 2 + dy - h / 2))
+        return (max(x, 0), max(y, 0), w, h)
+
+    return [(moved(r_left, dx, dy, scale), moved(r_right, -dx, dy, scale))
+            for dx, dy, scale in itertools.product(offsets, offsets, scales)]
+
+
+def configuration_tables(table):
+
+    # Uma tabela de diagnóstico (sets x diff_expiration, diff_inspiration, diag) por configuração (as colunas
+    # de parâmetros da tabela de Pipeline.sweep)
+    if table.empty:
+        return {}
+    columns = [column for column in table.columns if column not in ("set", "diff_expiration", "diff_inspiration", "diag")]
+
+    return {config: group.drop(columns=columns).set_index("set") for config, group in table.groupby(columns, sort=False)}
+
+
+if __name__ == "__main__":
+
+    def floats(text):
+        return [float(v) for v in text.split(",")]
+
+    parser = argparse.ArgumentParser(description="Varrimento de RoIs, sigma e limiar do diagnóstico EIT")
+    parser.add_argument("--sets", default=None, help="ex. 1-78 ou 1,3,5-9 (por omissão todos)")
+    parser.add_argument("--root", default=None, help="pasta com os sets (por omissão ICSTS_DATA_ROOT)")
+    parser.add_argument("--cache-dir", default=None, help="pasta da cache (por omissão ICSTS_CACHE_DIR)")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--workers", type=int, default=None, help="processos (por omissão, um por CPU)")
+    parser.add_argument("--offsets", type=floats, default=[0], help="deslocamentos das RoIs em pixels, ex. --offsets=-20,0,20")
+    parser.add_argument("--scales", type=floats, default=[1.0], help="escalas das RoIs, ex. 0.9,1,1.1")
+    parser.add_argument("--sigmas", type=floats, default=[2], help="sigma do filtro gaussiano em segundos")
+    parser.add_argument("--thresholds", type=floats, default=[0.5])
+    parser.add_argument("--output", default="sweep.csv")
+    args = parser.parse_args()
+
+    sets = get_dataset(args.root).sets()
+    if args.sets:
+        sets = [s for s in parse_sets(args.sets) if s in sets]
+
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers is None or args.workers > 1 else None
+    try:
+        pipeline = Pipeline(args.root, cache=not args.no_cache, cache_dir=args.cache_dir, executor=executor)
+        table = pipeline.sweep(sets, roi_grid(args.offsets, args.scales), sigma=args.sigmas, threshold=args.thresholds)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    for config, diagnosis in configuration_tables(table).items():
+        print("%s %s sigma=%g threshold=%g: %d/%d sets with diag=1" % (*config, diagnosis["diag"].sum(), len(diagnosis)))
+
+    # Sem nenhuma configuração diagnosticada a tabela não tem colunas; é escrita vazia
+    if table.empty:
+        print("Nenhuma configuração foi diagnosticada")
+    else:
+        table = table.astype({"r_left": str, "r_right": str})
+    output = write_table(table, args.output)
+    print("Resultados em " + output)
@@ -0,0 +1,101 @@
+"""
+Diagnóstico em lote de vários sets (sem input interativo)
+
+Example::
+
+    python batch_Task4.py --sets 1-78 --workers 8 --output results.parquet
+
+Every set is diagnosed with Task3.main_Task3.diagnose_set as its own task of one process pool
+(all sets are submitted at once), sharing the on-disk impedance cache between runs. The results
+table has one row per set and trial (diff_expiration, diff_inspiration and diag of the set, plus
+the values of the trial) and is written as Parquet (or CSV if the output ends in .csv).
+"""
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from Task3.dataset_Task3 import parse_sets, write_table
+from Task3.main_Task3 import diagnose_set
+
+
+def _diagnose(set, options):
+
+    # Executado num processo do pool: devolve a exceção em vez de a lançar, para um set falhado (frames em falta,
+    # PNG ilegível, trial sem picos...) não parar o lote
+    try:
+        return diagnose_set(set, **options)
+    except Exception as e:
+        return e
+
+
+def run_batch(sets, workers=None, **options):
+
+    rows = []
+    failed = []
+    n_frames = 0
+    start = time.time()
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers is None or workers > 1 else None
+
+    try:
+        if executor is None:
+            results = (_diagnose(set, options) for set in sets)
+        elif len(sets) == 1:
+            # Um único set: o pool reparte os blocos de frames dos seus trials
+            results = [_diagnose(sets[0], dict(options, executor=executor))]
+        else:
+            # Um future por set, todos submetidos de início: o pool nunca fica vazio entre sets, mesmo quando
+            # os sinais vêm da cache ou dos frames compactados
+            futures = [executor.submit(_diagnose, set, options) for set in sets]
+            results = (future.result() for future in futures)
+
+        for set, result in zip(sets, results):
+            if isinstance(result, Exception):
+                print("set %d: %s" % (set, result))
+                failed.append(set)
+                continue
+
+            n_frames += sum(result["n_frames"])
+            for i, trial in enumerate(result["trials"]):
+                rows.append({
+                    "set": set,
+                    "trial": trial,
+                    "n_frames": result["n_frames"][i],
+                    "diff_expiration_trial": result["diff_expiration_trial"][i],
+                    "diff_inspiration_trial": result["diff_inspiration_trial"][i],
+                    "diff_expiration": result["diff_expiration"],
+                    "diff_inspiration": result["diff_inspiration"],
+                    "diag": result["diag"],
+                })
+            print("set %d: diag=%d" % (set, result["diag"]))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    elapsed = time.time() - start
+    print("%d sets (%d failed), %d frames in %.1f s: %.1f frames/s, %.2f sets/min" % (
+        len(sets), len(failed), n_frames, elapsed, n_frames / elapsed, 60 * (len(sets) - len(failed)) / elapsed))
+
+    return pd.DataFrame(rows), failed
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Diagnóstico EIT em lote")
+    parser.add_argument("--sets", default="1-78", help="sets a diagnosticar, ex. 1-78 ou 1,3,5-9")
+    parser.add_argument("--workers", type=int, default=None, help="processos (por omissão, um por CPU)")
+    parser.add_argument("--root", default=None, help="pasta com os sets (por omissão ICSTS_DATA_ROOT)")
+    parser.add_argument("--cache-dir", default=None, help="pasta da cache (por omissão ICSTS_CACHE_DIR)")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--fps", type=float, default=None, help="frames por segundo (por omissão, do metadata.json de cada trial ou 33)")
+    parser.add_argument("--decimation", type=int, default=None, help="fator de reamostragem polifásica (por omissão, média por segundo)")
+    parser.add_argument("--output", default="results.parquet")
+    args = parser.parse_args()
+
+    table, failed = run_batch(parse_sets(args.sets), args.workers, root=args.root, cache_dir=args.cache_dir, cache=not args.no_cache, fps=args.fps, decimation=args.decimation)
+
+    output = write_table(table, args.output)
+    print("Resultados em " + output)